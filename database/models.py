@@ -1,8 +1,30 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, UniqueConstraint, Index
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, UniqueConstraint, Index, Computed
+from sqlalchemy import text, event, func
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .connection import Base
-import hashlib
+import xxhash
+
+def fingerprint_hash(raw: str) -> str:
+    """
+    Hex digest used for transaction fingerprints. They are dedup keys, not a
+    security boundary, so this is the non-cryptographic xxh128 (32 hex chars).
+    Changing it changes every stored fingerprint, so existing rows must be
+    recomputed by a migration when it does (see migration.py).
+    """
+    return xxhash.xxh128_hexdigest(raw.encode('utf-8'))
+
+def format_amount(amount: float) -> str:
+    """
+    Render an amount with 2 decimals exactly as fingerprints have always hashed
+    it ('%.2f', e.g. 2.675 -> '2.67', -0.005 -> '-0.01'). Changing this rounding
+    changes stored fingerprints, so it must stay '%.2f'.
+    """
+    return "%.2f" % float(amount)
+
+def to_cents(amount: float) -> int:
+    """Integer cents of an amount, rounded the same way as format_amount."""
+    return int(format_amount(amount).replace(".", ""))
 
 class Category(Base):
     __tablename__ = "categories"
@@ -43,6 +65,11 @@ class CategoryMap(Base):
     
     category = relationship("Category", back_populates="category_maps")
 
+# Expression indexes for the case-insensitive map lookups in enrichment
+# (lower(column) = lower(?)); declared after the classes since they index expressions
+Index('ix_merchant_maps_std_lower', func.lower(MerchantMap.standardized_merchant))
+Index('ix_category_maps_desc_lower', func.lower(CategoryMap.unmapped_description))
+
 class Budget(Base):
     __tablename__ = "budgets"
     
@@ -57,6 +84,28 @@ class Budget(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Partial index: only uncategorized rows, for the AI categorization scan
+        Index('ix_tx_uncat', 'category_id', 'date', sqlite_where=text('category_id IS NULL')),
+        # Lookup used by the AI bulk UPDATE (raw_description IN (...))
+        Index('ix_tx_raw_description', 'raw_description'),
+        # Partial index: excluded rows are rare, so a full index on the boolean is mostly dead weight
+        Index('ix_tx_excluded_true', 'id', sqlite_where=text('is_excluded = 1')),
+        # Covering index for the analytics date-range queries, with or without
+        # excluded rows: date, category_id, amount and is_excluded are all read
+        # from the index, never the table. Also serves plain date lookups.
+        Index('ix_tx_date_cover', 'date', 'category_id', 'amount', 'is_excluded'),
+        # Merchant grouping/lookup goes through the generated merchant_name column.
+        # Covering for get_top_merchants, so it groups in index order without a temp
+        # b-tree or table reads; the merchant_name prefix serves merchant history.
+        Index('ix_tx_merchant_cover', 'merchant_name', 'is_excluded', 'date', 'amount'),
+        # Covering index for the merchant analytics page (grouped/filtered by
+        # standardized_merchant over a date range)
+        Index('ix_tx_date_merchant_cover', 'date', 'standardized_merchant', 'amount', 'is_excluded'),
+        # Partial index: rows enrich_all_new_transactions still has to map
+        # (its WHERE must match this one for SQLite to use the index)
+        Index('ix_tx_unenriched', 'id', sqlite_where=text('standardized_merchant IS NULL OR category_id IS NULL')),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     
@@ -66,7 +115,7 @@ class Transaction(Base):
     fingerprint = Column(String, unique=False, nullable=False, index=True) 
     
     # Core Data
-    date = Column(DateTime, nullable=False, index=True)
+    date = Column(DateTime, nullable=False) # Indexed via ix_tx_date_cover
     amount = Column(Float, nullable=False) # Negative = Expense, Positive = Income
     description = Column(String, nullable=False) # The main display description
     raw_description = Column(String, nullable=True) # Original raw text from bank
@@ -83,7 +132,10 @@ class Transaction(Base):
     # AI/Normalization
     clean_description = Column(String, nullable=True)
     standardized_merchant = Column(String, nullable=True, index=True)
-    is_excluded = Column(Boolean, default=False, index=True)
+    # Display merchant: cleaned description when available. Generated by SQLite
+    # (VIRTUAL, so it can be added to existing tables with ALTER TABLE).
+    merchant_name = Column(String, Computed("coalesce(clean_description, description)", persisted=False))
+    is_excluded = Column(Boolean, default=False) # Indexed via ix_tx_excluded_true
     
     # Validation / Linking
     merchant_map_id = Column(Integer, ForeignKey("merchant_maps.id"), nullable=True)
@@ -105,12 +157,38 @@ class Transaction(Base):
         # Truncate description to avoid minor bank-suffix variations, 
         # though exact match is safer for now to avoid false positives.
         # We use strict Date + Amount + Full Description for safety.
-        raw_str = f"{date_str}|{float(amount):.2f}|{description.strip()}"
-        return hashlib.sha256(raw_str.encode('utf-8')).hexdigest()
+        return fingerprint_hash(f"{date_str}|{format_amount(amount)}|{description.strip()}")
+
+    @property
+    def amount_cents(self) -> int:
+        return to_cents(self.amount)
 
     def __repr__(self):
         return f"<Transaction {self.date} - {self.description} - {self.amount}>"
 
+class TxRollupMonth(Base):
+    """
+    Net and spending totals per (month, merchant, category, excluded flag), kept
+    current by triggers on transactions (see install_monthly_aggregate_triggers).
+    The single rollup behind the monthly income/expense, category and merchant
+    analytics. A missing merchant or category is stored as '' so the upsert key
+    never holds NULL; is_excluded is 0 only for rows with is_excluded = 0.
+    """
+    __tablename__ = "tx_rollup_month"
+    __table_args__ = (
+        # Merchant trend lookups (get_entity_time_series)
+        Index('ix_tx_rollup_merchant', 'merchant', 'month'),
+    )
+
+    month = Column(String, primary_key=True) # 'YYYY-MM'
+    merchant = Column(String, primary_key=True) # standardized_merchant, '' if unmapped
+    category_id = Column(String, primary_key=True) # '' if uncategorized
+    is_excluded = Column(Boolean, primary_key=True)
+    net_amount = Column(Float, nullable=False, default=0.0)
+    tx_count = Column(Integer, nullable=False, default=0)
+    spend_amount = Column(Float, nullable=False, default=0.0) # Sum of negative amounts
+    spend_count = Column(Integer, nullable=False, default=0)
+
 class ExclusionRule(Base):
     __tablename__ = "exclusion_rules"
 
@@ -154,3 +232,79 @@ class StagedTransaction(Base):
     
     # Metadata
     fetched_at = Column(DateTime, default=datetime.utcnow)
+
+
+# --- Monthly aggregate maintenance ---
+
+def _rollup_key(row: str) -> str:
+    """tx_rollup_month key expressions for a transaction row (prefix 'NEW.'/'OLD.', or '' in rebuilds)."""
+    return (f"substr({row}date, 1, 7), coalesce({row}standardized_merchant, ''), coalesce({row}category_id, ''), "
+            f"CASE WHEN {row}is_excluded = 0 THEN 0 ELSE 1 END")
+
+def _tx_rollup_upsert(row: str, sign: str) -> str:
+    """Trigger body statement adding (+) or removing (-) one transaction row (NEW/OLD)."""
+    return f"""
+        INSERT INTO tx_rollup_month (month, merchant, category_id, is_excluded, net_amount, tx_count, spend_amount, spend_count)
+        SELECT {_rollup_key(row + '.')},
+               {sign}({row}.amount),
+               {sign}1,
+               {sign}(CASE WHEN {row}.amount < 0 THEN {row}.amount ELSE 0 END),
+               {sign}(CASE WHEN {row}.amount < 0 THEN 1 ELSE 0 END)
+        WHERE 1
+        ON CONFLICT (month, merchant, category_id, is_excluded) DO UPDATE SET
+            net_amount = net_amount + excluded.net_amount,
+            tx_count = tx_count + excluded.tx_count,
+            spend_amount = spend_amount + excluded.spend_amount,
+            spend_count = spend_count + excluded.spend_count;
+        DELETE FROM tx_rollup_month
+        WHERE (month, merchant, category_id, is_excluded) = ({_rollup_key(row + '.')}) AND tx_count <= 0;"""
+
+TX_ROLLUP_TRIGGERS = {
+    "trg_tx_rollup_insert": f"""
+        CREATE TRIGGER trg_tx_rollup_insert AFTER INSERT ON transactions
+        BEGIN {_tx_rollup_upsert("NEW", "+")}
+        END""",
+    "trg_tx_rollup_delete": f"""
+        CREATE TRIGGER trg_tx_rollup_delete AFTER DELETE ON transactions
+        BEGIN {_tx_rollup_upsert("OLD", "-")}
+        END""",
+    # Only changes to the rolled-up columns touch the table
+    "trg_tx_rollup_update": f"""
+        CREATE TRIGGER trg_tx_rollup_update AFTER UPDATE OF date, amount, is_excluded, category_id, standardized_merchant ON transactions
+        BEGIN {_tx_rollup_upsert("OLD", "-")} {_tx_rollup_upsert("NEW", "+")}
+        END""",
+}
+
+def rebuild_tx_rollup_month(conn):
+    """Recompute tx_rollup_month from scratch (used when the triggers are first installed)."""
+    conn.execute(text("DELETE FROM tx_rollup_month"))
+    conn.execute(text(f"""
+        INSERT INTO tx_rollup_month (month, merchant, category_id, is_excluded, net_amount, tx_count, spend_amount, spend_count)
+        SELECT {_rollup_key('')},
+               SUM(amount),
+               COUNT(*),
+               SUM(CASE WHEN amount < 0 THEN amount ELSE 0 END),
+               SUM(CASE WHEN amount < 0 THEN 1 ELSE 0 END)
+        FROM transactions
+        GROUP BY {_rollup_key('')}
+    """))
+
+# Each trigger set with the rebuild that makes its table consistent again
+_AGGREGATE_TABLES = [
+    (TX_ROLLUP_TRIGGERS, rebuild_tx_rollup_month),
+]
+
+@event.listens_for(Base.metadata, "after_create")
+def install_monthly_aggregate_triggers(target, conn, **kw):
+    """
+    Create any missing aggregate triggers. If any of a table's triggers were missing
+    the table can't be trusted (new table, or an older DB), so it is rebuilt from transactions.
+    """
+    existing = {r[0] for r in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'"))}
+    for triggers, rebuild in _AGGREGATE_TABLES:
+        missing = [name for name in triggers if name not in existing]
+        if not missing:
+            continue
+        for name in missing:
+            conn.execute(text(triggers[name]))
+        rebuild(conn)
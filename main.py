@@ -1,18 +1,21 @@
 from nicegui import ui
 import os
 from database.connection import init_db
+from migration import run_migrations
 from services.backup import perform_daily_backup
 from ui.layout import frame
 from ui.pages import dashboard, transactions, import_page, excluded, batch_exclude, merchant_intelligence, import_mappings, budget_planning, spending_report, bank_sync
 
 # --- BACKUP SYSTEM ---
-# Run daily backup on startup to ensure data is safe locally
+# Run daily backup on startup to ensure data is safe locally.
+# Taken before init_db()/run_migrations() so it holds the data as it was before any schema or data change.
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'finapp_v2.db')
 BACKUP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backups')
 perform_daily_backup(DB_PATH, BACKUP_PATH)
 
-# Ensure DB tables exist
+# Ensure DB tables exist and older DBs are brought up to date
 init_db()
+run_migrations()
 
 # --- ROUTES ---
 
@@ -1,18 +1,136 @@
-from database.connection import engine
+from database.connection import engine, DB_FILE
+from database.models import fingerprint_hash
+from services.backup import backup_before_migration
 from sqlalchemy import text
+import hashlib
+import logging
+import os
 
-def run_migrations():
+logger = logging.getLogger(__name__)
+
+BACKUP_DIR = os.path.join(os.path.dirname(os.path.normpath(DB_FILE)), "backups")
+
+def rehash_legacy_fingerprints(conn):
+    """
+    Convert SHA-256 fingerprints (64 hex chars) to fingerprint_hash (xxh128, 32).
+    A hash can't be converted directly, so each row's fingerprint string is rebuilt
+    from date, amount and description, in the importer's whitespace-collapsed form
+    or Transaction.generate_fingerprint's stripped form, and used only if its
+    SHA-256 matches the stored value. Rows whose inputs have changed since keep
+    their old fingerprint. Runs once, as data migration 1 (see run_data_migrations).
+    """
+    rows = conn.execute(text(
+        "SELECT id, date, amount, description, fingerprint FROM transactions WHERE length(fingerprint) = 64"
+    )).all()
+    updates = []
+    for tx_id, date_val, amount, description, old_fp in rows:
+        if date_val is None or amount is None:
+            continue
+        # The legacy SHA-256 input, exactly as the old code rendered it
+        prefix = f"{str(date_val)[:10]}|{float(amount):.2f}|"
+        desc = str(description)
+        for candidate in (" ".join(desc.split()), desc.strip()):
+            raw = prefix + candidate
+            if hashlib.sha256(raw.encode('utf-8')).hexdigest() == old_fp:
+                updates.append({'id': tx_id, 'fp': fingerprint_hash(raw)})
+                break
+    if updates:
+        conn.execute(text("UPDATE transactions SET fingerprint = :fp WHERE id = :id"), updates)
+    if rows:
+        logger.info(f"Rehashed {len(updates)} of {len(rows)} legacy fingerprints")
+
+def strip_float_account_numbers(conn):
+    """
+    CSV card/account-number columns with blanks used to be read as floats, so
+    imported rows were named 'Account 1234.0'. They are read as text now
+    ('Account 1234'); existing names are rewritten to match so each account keeps
+    a single name. Runs once, as data migration 2 (see run_data_migrations).
+    """
+    result = conn.execute(text(
+        "UPDATE transactions SET account_name = substr(account_name, 1, length(account_name) - 2) "
+        "WHERE account_name GLOB 'Account [0-9]*.0' "
+        "AND substr(account_name, 9, length(account_name) - 10) NOT GLOB '*[^0-9]*'"
+    ))
+    if result.rowcount:
+        logger.info(f"Renamed {result.rowcount} 'Account N.0' account names")
+
+# Row-rewriting migrations, each applied exactly once, in order.
+# PRAGMA user_version records how many have been applied.
+DATA_MIGRATIONS = [
+    rehash_legacy_fingerprints, # 1
+    strip_float_account_numbers, # 2
+]
+
+def run_data_migrations():
+    """
+    Apply pending DATA_MIGRATIONS after a synchronous backup of the database.
+    If the backup fails nothing is rewritten, and they are retried on the next run.
+    """
     with engine.connect() as conn:
-        print("Running migrations...")
-        
-        # Helper to ignore error if column exists
+        version = conn.execute(text("PRAGMA user_version")).scalar()
+        has_rows = bool(conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions'"
+        )).first()) and bool(conn.execute(text("SELECT EXISTS (SELECT 1 FROM transactions)")).scalar())
+    if version >= len(DATA_MIGRATIONS):
+        return
+    if has_rows:
+        try:
+            backup_before_migration(os.path.normpath(DB_FILE), BACKUP_DIR, version + 1)
+        except Exception:
+            logger.exception("Pre-migration backup failed; data migrations skipped")
+            return
+
+    # user_version is written inside the same transaction as each migration's changes
+    with engine.begin() as conn:
+        for number, migrate in enumerate(DATA_MIGRATIONS[version:], start=version + 1):
+            if has_rows:
+                migrate(conn)
+            conn.execute(text(f"PRAGMA user_version = {number}"))
+            logger.info(f"Applied data migration {number} ({migrate.__name__})")
+
+def run_migrations():
+    # One transaction for the whole run; on an up-to-date DB it only reads the schema.
+    with engine.begin() as conn:
+        logger.info("Running migrations...")
+
+        # Cache of existing columns per table, and of existing index names
+        table_cols = {}
+        existing_indexes = {r[0] for r in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+
+        def existing_cols(table):
+            if table not in table_cols:
+                # table_xinfo (unlike table_info) also lists generated columns
+                table_cols[table] = {row[1] for row in conn.execute(text(f"PRAGMA table_xinfo({table})"))}
+            return table_cols[table]
+
+        # Helper: only ALTER when the column is missing
         def add_column(table, col_def):
-            try:
-                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {col_def}"))
-                print(f"Added {col_def} to {table}")
-            except Exception as e:
-                # SQLite throws specific error usually, or generic
-                pass
+            cols = existing_cols(table)
+            if not cols:
+                # Table doesn't exist yet; create_all will build it with every column
+                return
+            col_name = col_def.split()[0]
+            if col_name in cols:
+                return
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {col_def}"))
+            cols.add(col_name)
+            logger.info(f"Added {col_def} to {table}")
+
+        # Helper: only CREATE INDEX when it is missing
+        def create_index(name, table, index_def):
+            if name in existing_indexes or not existing_cols(table):
+                return
+            conn.execute(text(f"CREATE INDEX {name} ON {table} {index_def}"))
+            existing_indexes.add(name)
+            logger.info(f"Created index {name}")
+
+        # Helper: DROP INDEX only when it exists
+        def drop_index(name):
+            if name not in existing_indexes:
+                return
+            conn.execute(text(f"DROP INDEX {name}"))
+            existing_indexes.discard(name)
+            logger.info(f"Dropped index {name}")
 
         # MerchantMap
         add_column("merchant_maps", "created_at DATETIME")
@@ -25,13 +143,29 @@ def run_migrations():
         add_column("category_maps", "created_at DATETIME")
         add_column("category_maps", "updated_at DATETIME")
         add_column("category_maps", "is_active BOOLEAN DEFAULT 1")
-        
+
         # Transaction
         add_column("transactions", "merchant_map_id INTEGER")
         add_column("transactions", "category_map_id INTEGER")
-        
-        conn.commit()
-        print("Migrations complete.")
+        add_column("transactions", "merchant_name TEXT GENERATED ALWAYS AS (coalesce(clean_description, description)) VIRTUAL")
+
+        # Indexes (new tables get these from create_all; existing DBs need them added)
+        create_index("ix_tx_uncat", "transactions", "(category_id, date) WHERE category_id IS NULL")
+        create_index("ix_tx_raw_description", "transactions", "(raw_description)")
+        create_index("ix_tx_excluded_true", "transactions", "(id) WHERE is_excluded = 1")
+        create_index("ix_tx_date_cover", "transactions", "(date, category_id, amount, is_excluded)")
+        create_index("ix_tx_merchant_cover", "transactions", "(merchant_name, is_excluded, date, amount)")
+        create_index("ix_tx_date_merchant_cover", "transactions", "(date, standardized_merchant, amount, is_excluded)")
+        create_index("ix_tx_unenriched", "transactions", "(id) WHERE standardized_merchant IS NULL OR category_id IS NULL")
+        create_index("ix_merchant_maps_std_lower", "merchant_maps", "(lower(standardized_merchant))")
+        create_index("ix_category_maps_desc_lower", "category_maps", "(lower(unmapped_description))")
+
+        # Superseded indexes
+        drop_index("ix_transactions_is_excluded") # replaced by ix_tx_excluded_true
+        drop_index("ix_transactions_date") # prefix of ix_tx_date_cover
+
+    run_data_migrations()
+    logger.info("Migrations complete.")
 
 if __name__ == "__main__":
     run_migrations()
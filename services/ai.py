@@ -1,9 +1,12 @@
 import os
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 from database.models import Transaction, Category, CategoryMap
+from database.connection import bulk_insert
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
@@ -17,26 +20,70 @@ try:
 except:
     pass
 
+# orjson is optional; it parses noticeably faster than the stdlib
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 API_KEY = os.getenv("GOOGLE_API_KEY")
 if API_KEY:
     genai.configure(api_key=API_KEY)
 
+# Max Gemini requests in flight at once
+MAX_CONCURRENT_REQUESTS = 8
+
+# Ask Gemini for strict JSON matching this shape instead of free text
+RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "description": {"type": "STRING"},
+            "category_id": {"type": "STRING", "nullable": True},
+        },
+        "required": ["description"],
+    },
+}
+
+_MODEL = None
+
+def _get_model():
+    """Lazily create and reuse a single Gemini model instance."""
+    global _MODEL
+    if _MODEL is None:
+        _MODEL = genai.GenerativeModel(
+            'gemini-1.5-flash',
+            generation_config={
+                "response_mime_type": "application/json",
+                "response_schema": RESPONSE_SCHEMA,
+            }
+        )
+    return _MODEL
+
 def get_uncategorized_transactions(db: Session):
     """
-    Fetch transactions that have no category_id.
+    Stream the distinct (raw_description, description) pairs of transactions
+    that have no category_id. Yields plain tuples, not ORM objects.
     """
-    return db.query(Transaction).filter(Transaction.category_id == None).all()
+    return db.query(Transaction.raw_description, Transaction.description)\
+             .filter(Transaction.category_id == None)\
+             .distinct().yield_per(1000)
 
-def generate_prompt(descriptions: list, categories: list) -> str:
+def build_taxonomy_str(categories: list) -> str:
     """
-    Constructs the prompt for Gemini.
+    Renders the category taxonomy for the prompt. Built once per run.
     """
-    # Create taxonomy string
-    taxonomy_str = ""
-    for c in categories:
-        sub = f" > {c.subcategory}" if c.subcategory else ""
-        taxonomy_str += f"- ID: {c.id} | Path: {c.section} > {c.category}{sub}\n"
+    return "".join(
+        f"- ID: {c.id} | Path: {c.section} > {c.category}{f' > {c.subcategory}' if c.subcategory else ''}\n"
+        for c in categories
+    )
 
+def generate_prompt(descriptions: list, taxonomy_str: str) -> str:
+    """
+    Constructs the prompt for Gemini.
+    """
     # Create transactions string
     tx_str = "\n".join([f"- {d}" for d in descriptions])
 
@@ -76,79 +123,105 @@ def run_auto_categorization(db: Session, batch_size=50):
         return 0, 0
 
     # 1. Fetch Data
-    uncategorized_txs = get_uncategorized_transactions(db)
-    if not uncategorized_txs:
+    # Get unique descriptions to save tokens/calls
+    # We only map UNIQUE descriptions (first-seen order keeps prompts reproducible).
+    unique_descs = list(dict.fromkeys(
+        raw or desc for raw, desc in get_uncategorized_transactions(db) if (raw or desc)
+    ))
+    if not unique_descs:
         logger.info("No uncategorized transactions found.")
         return 0, 0
-
-    # Get unique descriptions to save tokens/calls
-    # We only map UNIQUE descriptions.
-    unique_descs = list(set([t.raw_description or t.description for t in uncategorized_txs if (t.raw_description or t.description)]))
     
-    logger.info(f"Found {len(uncategorized_txs)} transactions with {len(unique_descs)} unique descriptions.")
+    logger.info(f"Found {len(unique_descs)} unique descriptions on uncategorized transactions.")
 
-    # Fetch Taxonomy
-    categories = db.query(Category).all()
+    # Fetch Taxonomy (only the columns the prompt needs)
+    categories = db.query(Category.id, Category.section, Category.category, Category.subcategory).all()
+    valid_ids = frozenset(c.id for c in categories)
+    taxonomy_str = build_taxonomy_str(categories)
+    # End the read transaction before the API calls: no transaction stays open
+    # while waiting on the network; each batch below commits its own writes.
+    db.commit()
     
     # 2. Batch Process
     total_processed = 0
     total_updates = 0
     
-    # Process in chunks
-    for i in range(0, len(unique_descs), batch_size):
-        batch = unique_descs[i : i + batch_size]
-        logger.info(f"Processing batch {i} to {i+len(batch)}...")
+    def fetch_mappings(batch):
+        # Runs on a worker thread: only talks to Gemini, never touches the DB session.
+        prompt = generate_prompt(batch, taxonomy_str)
+        response = _get_model().generate_content(prompt)
         
-        prompt = generate_prompt(batch, categories)
+        # JSON mode returns bare JSON, no ```json fences to strip
+        return _json_loads(response.text)
+
+    # Process in chunks. API calls are I/O bound, so several run concurrently;
+    # results are applied to the DB on this thread, in batch order, each batch
+    # committed as soon as its result arrives.
+    batches = [unique_descs[i : i + batch_size] for i in range(0, len(unique_descs), batch_size)]
+    
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as pool:
+        futures = [pool.submit(fetch_mappings, batch) for batch in batches]
         
-        try:
-            model = genai.GenerativeModel('gemini-1.5-flash')
-            response = model.generate_content(prompt)
+        for n, future in enumerate(futures):
+            logger.info(f"Processing batch {n * batch_size} to {n * batch_size + len(batches[n])}...")
             
-            # Clean response (sometimes gemini puts ```json ... ```)
-            content = response.text.replace("```json", "").replace("```", "").strip()
+            try:
+                mappings = future.result()
+            except Exception as e:
+                logger.error(f"Error processing batch: {e}")
+                continue
             
-            mappings = json.loads(content)
-            
-            # 3. Update DB
-            for item in mappings:
-                desc_str = item.get('description')
-                cat_id = item.get('category_id')
+            # Each batch is its own short write transaction: a failure rolls back only
+            # that batch, and the write lock isn't held while other API calls are in flight.
+            try:
+                # 3. Group descriptions by category so each category is one UPDATE
+                descs_by_cat = {}
+                for item in mappings:
+                    desc_str = item.get('description')
+                    cat_id = item.get('category_id')
                 
-                if desc_str and cat_id:
                     # Validate Cat ID exists
-                    valid_cat = db.query(Category).filter(Category.id == cat_id).first()
-                    if not valid_cat:
-                        continue
-                        
-                    # A. Update ALL matching transactions
-                    # We match on raw_description OR description depending on what we sent.
-                    # We sent raw if available.
-                    # Update transactions where raw_desc matches OR description matches 
-                    # (Simple logic: just update ones where field matches the prompt input)
-                    
-                    # Find txs to update
-                    txs_to_update = db.query(Transaction).filter(
-                        (Transaction.raw_description == desc_str) | (Transaction.description == desc_str),
-                        Transaction.category_id == None
-                    ).all()
-                    
-                    for tx in txs_to_update:
-                        tx.category_id = cat_id
-                        total_processed += 1
-                        
-                    # B. Save to CategoryMap (Memory)
-                    # Check if rule exists
-                    existing_rule = db.query(CategoryMap).filter(CategoryMap.unmapped_description == desc_str).first()
-                    if not existing_rule:
-                        new_rule = CategoryMap(unmapped_description=desc_str, scsc_id=cat_id)
-                        db.add(new_rule)
-                        total_updates += 1
+                    if desc_str and cat_id in valid_ids:
+                        descs_by_cat.setdefault(cat_id, []).append(desc_str)
+            
+                # A. Update ALL matching transactions
+                # We sent raw_description if available, so match on raw_description OR description.
+                batch_processed = 0
+                for cat_id, descs in descs_by_cat.items():
+                    result = db.execute(
+                        update(Transaction)
+                        .where(
+                            Transaction.raw_description.in_(descs) | Transaction.description.in_(descs),
+                            Transaction.category_id == None
+                        )
+                        .values(category_id=cat_id)
+                        .execution_options(synchronize_session=False)
+                    )
+                    batch_processed += result.rowcount
+            
+                # B. Save to CategoryMap (Memory) - only descriptions without an existing rule
+                all_descs = [d for descs in descs_by_cat.values() for d in descs]
+                existing = set(db.scalars(
+                    select(CategoryMap.unmapped_description).where(CategoryMap.unmapped_description.in_(all_descs))
+                ).all())
             
-            db.commit()
+                new_rules = []
+                for cat_id, descs in descs_by_cat.items():
+                    for desc_str in descs:
+                        if desc_str not in existing:
+                            new_rules.append({'unmapped_description': desc_str, 'scsc_id': cat_id})
+                            existing.add(desc_str)
+            
+                if new_rules:
+                    bulk_insert(db, CategoryMap, new_rules)
+                
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Error saving batch: {e}")
+                continue
             
-        except Exception as e:
-            logger.error(f"Error processing batch: {e}")
-            continue
+            total_processed += batch_processed
+            total_updates += len(new_rules)
 
     return total_processed, total_updates
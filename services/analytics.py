@@ -1,54 +1,102 @@
-from sqlalchemy import func, extract, desc, case
+from sqlalchemy import func, extract, desc, case, select, union_all, null, literal, String
 from sqlalchemy.orm import Session
-from database.models import Transaction, Category, Budget
-from datetime import datetime, timedelta
+from database.models import Transaction, Category, Budget, TxRollupMonth
+from datetime import datetime, date
+from dateutil.relativedelta import relativedelta
+from collections import defaultdict
+import sqlite3
+import numpy as np
 import pandas as pd
 
+# Aggregate FILTER (WHERE ...) clauses need SQLite 3.30+; older builds use CASE
+_HAS_AGGREGATE_FILTER = sqlite3.sqlite_version_info >= (3, 30, 0)
+
+def _sum_amount_where(condition):
+    """SUM(amount) over rows matching `condition`; 0 when none match."""
+    if _HAS_AGGREGATE_FILTER:
+        return func.coalesce(func.sum(Transaction.amount).filter(condition), 0)
+    return func.sum(case((condition, Transaction.amount), else_=0))
+
+def _month_bucket():
+    # DateTime is stored as an ISO string, so the first 7 chars are 'YYYY-MM'.
+    # Cheaper than strftime, which re-parses every row's date.
+    return func.substr(Transaction.date, 1, 7, type_=String).label('month')
+
+def _rollup_month_totals(include_excluded: bool):
+    """(month, income, expense) per month from tx_rollup_month; callers add the month range."""
+    query = select(
+        TxRollupMonth.month.label('month'),
+        func.sum(TxRollupMonth.net_amount - TxRollupMonth.spend_amount).label('income'),
+        func.sum(TxRollupMonth.spend_amount).label('expense')
+    ).group_by(TxRollupMonth.month)
+    if not include_excluded:
+        query = query.where(TxRollupMonth.is_excluded == False)
+    return query
+
 def get_monthly_net_income(db: Session, months=12, include_excluded=False):
     """
     Returns monthly Income vs Expense aggregation for the last `months` months.
     """
-    trunc_date = func.strftime('%Y-%m', Transaction.date).label('month')
-    
-    query = db.query(
-        trunc_date,
-        func.sum(case((Transaction.amount > 0, Transaction.amount), else_=0)).label('income'),
-        func.sum(case((Transaction.amount < 0, Transaction.amount), else_=0)).label('expense')
+    # First day of the oldest month in the window
+    today = datetime.now()
+    month_index = today.year * 12 + (today.month - 1) - (months - 1)
+    window_start = datetime(month_index // 12, month_index % 12 + 1, 1)
+
+    # Reads the trigger-maintained tx_rollup_month instead of scanning and
+    # grouping every transaction in the window.
+    query = _rollup_month_totals(include_excluded).where(
+        TxRollupMonth.month >= window_start.strftime('%Y-%m')
     )
-    
-    if not include_excluded:
-        query = query.filter(Transaction.is_excluded == False)
 
-    query = query.group_by(trunc_date).order_by(trunc_date.desc()).limit(months)
-    
-    results = query.all()
-    # Reverse to show chronological
-    return sorted(results, key=lambda x: x[0])
+    # Latest `months` rows, returned in chronological order by the outer SELECT
+    latest = query.order_by(TxRollupMonth.month.desc()).limit(months).subquery()
+    return db.execute(select(latest).order_by(latest.c.month.asc())).all()
 
 def get_net_income_range(db: Session, start_date, end_date, include_excluded=False):
     """
     Returns monthly Income vs Expense aggregation for a specific date range.
     """
-    trunc_date = func.strftime('%Y-%m', Transaction.date).label('month')
+    # Compare as datetimes, the way the bounds are bound against the DateTime column
+    start = datetime.combine(start_date, datetime.min.time()) if not isinstance(start_date, datetime) else start_date
+    end = datetime.combine(end_date, datetime.min.time()) if not isinstance(end_date, datetime) else end_date
     
-    query = db.query(
+    # Months lying wholly inside [start, end] are read from the trigger-maintained
+    # tx_rollup_month; only the partial months at either edge scan transactions.
+    first_full = start.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if first_full < start:
+        first_full += relativedelta(months=1)
+    end_floor = end.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    
+    trunc_date = _month_bucket()
+    scan = select(
         trunc_date,
-        func.sum(case((Transaction.amount > 0, Transaction.amount), else_=0)).label('income'),
-        func.sum(case((Transaction.amount < 0, Transaction.amount), else_=0)).label('expense')
-    ).filter(
-        Transaction.date >= start_date,
-        Transaction.date <= end_date
+        _sum_amount_where(Transaction.amount > 0).label('income'),
+        _sum_amount_where(Transaction.amount < 0).label('expense')
     )
-    
     if not include_excluded:
-        query = query.filter(Transaction.is_excluded == False)
-
-    query = query.group_by(trunc_date).order_by(trunc_date)
-    return query.all()
+        scan = scan.where(Transaction.is_excluded == False)
+    
+    if first_full >= end_floor:
+        # No complete month in range
+        scan = scan.where(Transaction.date >= start_date, Transaction.date <= end_date)
+        return db.execute(scan.group_by(trunc_date).order_by(trunc_date)).all()
+    
+    edges = scan.where(
+        ((Transaction.date >= start_date) & (Transaction.date < first_full)) |
+        ((Transaction.date >= end_floor) & (Transaction.date <= end_date))
+    ).group_by(trunc_date)
+    
+    full_months = _rollup_month_totals(include_excluded).where(
+        TxRollupMonth.month >= first_full.strftime('%Y-%m'),
+        TxRollupMonth.month < end_floor.strftime('%Y-%m')
+    )
+    
+    return db.execute(union_all(full_months, edges).order_by('month')).all()
 
 def get_category_breakdown(db: Session, year: int, month: int, include_excluded=False):
     """
-    Returns spending by Category for Sunburst chart (Net Expenses only).
+    Returns spending by Category for Sunburst chart (Net Expenses only),
+    as a DataFrame with columns section, category, amount.
     """
     start_date = datetime(year, month, 1)
     if month == 12:
@@ -56,37 +104,30 @@ def get_category_breakdown(db: Session, year: int, month: int, include_excluded=
     else:
         end_date = datetime(year, month + 1, 1)
 
-    query = db.query(
-        Category.section,
-        Category.category,
-        func.sum(Transaction.amount).label('net_amount')
-    ).join(Category, Transaction.category_id == Category.id)
-    
-    query = query.filter(Transaction.date >= start_date, Transaction.date < end_date)
-    
-    if not include_excluded:
-        query = query.filter(Transaction.is_excluded == False)
+    if include_excluded:
+        net_amount = func.sum(Transaction.amount)
+        query = db.query(Category.section, Category.category, (-net_amount).label('amount'))\
+                  .join(Category, Transaction.category_id == Category.id)\
+                  .filter(Transaction.date >= start_date, Transaction.date < end_date)
+    else:
+        # Non-excluded totals are maintained per (month, category) in tx_rollup_month
+        net_amount = func.sum(TxRollupMonth.net_amount)
+        query = db.query(Category.section, Category.category, (-net_amount).label('amount'))\
+                  .join(Category, TxRollupMonth.category_id == Category.id)\
+                  .filter(TxRollupMonth.month == f"{year:04d}-{month:02d}", TxRollupMonth.is_excluded == False)
     
     query = query.group_by(Category.section, Category.category)
+    # Net expenses only, as positive amounts; filtered and negated in SQL
+    query = query.having(net_amount < 0)
     
-    results = query.all()
-    
-    data = []
-    for r in results:
-        net_val = r[2]
-        if net_val < 0:
-            data.append({
-                'section': r[0],
-                'category': r[1],
-                'amount': abs(net_val)
-            })
-    return data
+    return pd.DataFrame(query.all(), columns=['section', 'category', 'amount'])
 
 def get_top_merchants(db: Session, start_date=None, end_date=None, limit=10, include_excluded=False):
     """
-    Returns top expenses by merchant (grouping by clean_description if available).
+    Returns top expenses by merchant (grouping by clean_description if available),
+    as a DataFrame with columns merchant, amount, count.
     """
-    merchant_name = func.coalesce(Transaction.clean_description, Transaction.description).label('merchant')
+    merchant_name = Transaction.merchant_name.label('merchant')
     
     query = db.query(
         merchant_name,
@@ -106,28 +147,53 @@ def get_top_merchants(db: Session, start_date=None, end_date=None, limit=10, inc
     query = query.having(func.sum(Transaction.amount) < 0)
     query = query.order_by(func.sum(Transaction.amount).asc()).limit(limit)
     
-    results = query.all()
-    return [{'merchant': r[0], 'amount': r[1], 'count': r[2]} for r in results]
+    return pd.DataFrame(query.all(), columns=['merchant', 'amount', 'count'])
+
+# Rows hydrated per chunk when streaming unbounded transaction lists
+STREAM_BATCH_SIZE = 1000
+
+# Columns returned by get_merchant_history (plain rows, not Transaction objects)
+HISTORY_COLUMNS = (
+    Transaction.id,
+    Transaction.date,
+    Transaction.amount,
+    Transaction.description,
+    Transaction.clean_description,
+    Transaction.account_name,
+    Transaction.category_id,
+)
 
-def get_merchant_history(db: Session, merchant_name, include_excluded=False):
+def _paginate(query, limit=None, offset=None):
+    """Apply optional LIMIT/OFFSET; the query must have a deterministic order."""
+    if limit is not None:
+        query = query.limit(limit)
+    if offset:
+        query = query.offset(offset)
+    return query
+
+def get_merchant_history(db: Session, merchant_name, include_excluded=False, limit=None, offset=None):
     """
-    Get full history for a specific merchant name.
+    Get full history for a specific merchant name, newest first.
+    Streams lightweight rows (see HISTORY_COLUMNS) in chunks; iterate once,
+    or wrap in list() if needed. Pass limit/offset to fetch a single page.
     """
-    query = db.query(Transaction)
+    query = db.query(*HISTORY_COLUMNS)
     
     if not include_excluded:
         query = query.filter(Transaction.is_excluded == False)
 
-    query = query.filter(
-        func.coalesce(Transaction.clean_description, Transaction.description) == merchant_name
-    )
+    query = query.filter(Transaction.merchant_name == merchant_name)
     
-    query = query.order_by(Transaction.date.desc())
-    return query.all()
+    query = _paginate(query.order_by(Transaction.date.desc(), Transaction.id.desc()), limit, offset)
+    return query.execution_options(stream_results=True).yield_per(STREAM_BATCH_SIZE)
 
-def get_monthly_transactions(db: Session, year: int, month: int, type: str, include_excluded=False):
+def get_monthly_transactions(db: Session, year: int, month: int, type: str, include_excluded=False,
+                             limit=None, offset=None):
     """
-    Fetch transactions for a specific month and type (Income/Expense).
+    Fetch transactions for a specific month and type (Income/Expense), newest first.
+    Streams rows of (id, date, description, amount, category) in chunks;
+    category is the category name or None. Iterate once, or wrap in list() if needed.
+    Pass limit/offset to fetch a single page.
     """
     start_date = datetime(year, month, 1)
     if month == 12:
@@ -135,7 +201,13 @@ def get_monthly_transactions(db: Session, year: int, month: int, type: str, incl
     else:
         end_date = datetime(year, month + 1, 1)
         
-    query = db.query(Transaction).filter(
+    query = db.query(
+        Transaction.id,
+        Transaction.date,
+        Transaction.description,
+        Transaction.amount,
+        Category.category.label('category')
+    ).outerjoin(Category, Transaction.category_id == Category.id).filter(
         Transaction.date >= start_date,
         Transaction.date < end_date
     )
@@ -148,7 +220,8 @@ def get_monthly_transactions(db: Session, year: int, month: int, type: str, incl
     if not include_excluded:
         query = query.filter(Transaction.is_excluded == False)
         
-    return query.order_by(Transaction.date.desc()).all()
+    query = _paginate(query.order_by(Transaction.date.desc(), Transaction.id.desc()), limit, offset)
+    return query.execution_options(stream_results=True).yield_per(STREAM_BATCH_SIZE)
 
 # --- Budget Analytics ---
 
@@ -156,25 +229,34 @@ def calculate_category_baselines(db: Session, months: int = 12) -> dict:
     """
     Calculates Annual Spending Baseline (Monthly Average * 12).
     """
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=30*months)
+    # The last `months` complete calendar months (the current, partial month is left out)
+    end_date = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    start_date = end_date - relativedelta(months=months)
     
-    # Sum spending (negative amounts) groupings by scsc_id
+    # Sum spending (negative amounts) per month and scsc_id
+    month_bucket = _month_bucket()
     query = db.query(
+        month_bucket,
         Transaction.category_id,
         func.sum(Transaction.amount)
     ).filter(
         Transaction.amount < 0,
         Transaction.date >= start_date,
+        Transaction.date < end_date,
         Transaction.category_id != None
-    ).group_by(Transaction.category_id)
+    ).group_by(month_bucket, Transaction.category_id)
     
     results = query.all()
     
+    monthly_totals = defaultdict(list)
+    for month, category_id, total in results:
+        monthly_totals[category_id].append(total)
+    
     baselines = {}
-    for r in results:
-        total_spend = abs(r[1])
-        avg_monthly_spend = total_spend / months
+    for category_id, totals in monthly_totals.items():
+        # Average over every month in the window; months without spending count
+        # as zero, so an occasional expense isn't annualized as if it were monthly
+        avg_monthly_spend = abs(sum(totals)) / months
         
         # Annualize
         annual_projection = avg_monthly_spend * 12
@@ -182,7 +264,7 @@ def calculate_category_baselines(db: Session, months: int = 12) -> dict:
         # Round to nearest 100 as requested
         rounded_annual = round(annual_projection / 100) * 100
         
-        baselines[r[0]] = rounded_annual
+        baselines[category_id] = rounded_annual
         
     return baselines
 
@@ -200,66 +282,58 @@ def get_budget_comparison(db: Session, start_date: datetime, end_date: datetime,
     if 28 <= days <= 31:
         year_ratio = 1.0 / 12.0
     
-    # 1. Get Actual Spending by Category for the period
-    actuals_query = db.query(
-        Category.id.label('scsc_id'),
-        Category.section,
-        Category.category,
+    # Actual spending per category for the period, joined with each category's
+    # Budget (ANNUAL amounts) in one statement
+    actuals_query = select(
+        Transaction.category_id.label('scsc_id'),
         func.sum(Transaction.amount).label('actual_amount')
-    ).join(Category, Transaction.category_id == Category.id)\
-     .filter(Transaction.date >= start_date, Transaction.date <= end_date)\
-     .filter(Transaction.amount < 0)
+    ).where(Transaction.date >= start_date, Transaction.date <= end_date)\
+     .where(Transaction.amount < 0)
     
     if not include_excluded:
-        actuals_query = actuals_query.filter(Transaction.is_excluded == False)
+        actuals_query = actuals_query.where(Transaction.is_excluded == False)
         
-    actuals_rows = actuals_query.group_by(Category.id).all()
+    actuals = actuals_query.group_by(Transaction.category_id).subquery('category_actuals')
     
-    actuals_map = {r.scsc_id: abs(r.actual_amount) for r in actuals_rows}
-    category_info = {r.scsc_id: {'section': r.section, 'category': r.category} for r in actuals_rows}
+    # Only categories with a budget or some spending are reported
+    rows = db.execute(
+        select(
+            Category.id, Category.section, Category.category,
+            func.coalesce(Budget.amount, 0.0), func.abs(func.coalesce(actuals.c.actual_amount, 0.0))
+        )
+        .select_from(Category)
+        .join(Budget, Budget.scsc_id == Category.id, isouter=True)
+        .join(actuals, actuals.c.scsc_id == Category.id, isouter=True)
+        .where((Budget.amount != None) | (actuals.c.actual_amount != None))
+        .order_by(Category.id)
+    ).all()
     
-    # 2. Get All Budgets (ANNUAL amounts)
-    budgets = db.query(Budget).all()
-    budget_map = {b.scsc_id: b.amount for b in budgets}
+    # Arithmetic done column-wise over aligned arrays
+    values = np.array([(r[3], r[4]) for r in rows], dtype=float).reshape(-1, 2)
+    annual, actual = values[:, 0], values[:, 1]
     
-    all_categories = db.query(Category).all()
-    for c in all_categories:
-        if c.id not in category_info:
-            category_info[c.id] = {'section': c.section, 'category': c.category}
-            
-    # 3. Merge
-    all_ids = set(actuals_map.keys()) | set(budget_map.keys())
+    period = annual * year_ratio
+    variance = period - actual
+    variance_pct = np.divide(variance, period, out=np.zeros_like(variance), where=period > 0) * 100
+    status = np.where(variance < 0, 'Over Budget',
+                      np.where((variance > 0) & (period > 0), 'Under Budget', 'On Track'))
     
     data = []
-    
-    for scsc_id in all_ids:
-        annual_budget = budget_map.get(scsc_id, 0.0)
-        period_budget = annual_budget * year_ratio
-        
-        actual = actuals_map.get(scsc_id, 0.0)
-        info = category_info.get(scsc_id, {'section': 'Unknown', 'category': 'Unknown'})
-        
-        variance = period_budget - actual
-        variance_pct = (variance / period_budget * 100) if period_budget > 0 else 0
-        
-        status = 'On Track'
-        if variance < 0:
-            status = 'Over Budget'
-        elif variance > 0 and period_budget > 0:
-            status = 'Under Budget'
-            
+    for r, b, a, p, v, pct, st in zip(
+        rows, annual.tolist(), actual.tolist(), period.tolist(),
+        variance.tolist(), variance_pct.tolist(), status.tolist()
+    ):
         data.append({
-            'scsc_id': scsc_id,
-            'section': info['section'],
-            'category': info['category'],
-            'budgeted': period_budget, 
-            'annual_budget': annual_budget,
-            'actual': actual,
-            'variance': variance,
-            'variance_pct': variance_pct,
-            'status': status
-        })
-        
+            'scsc_id': r.id,
+            'section': r.section,
+            'category': r.category,
+            'budgeted': p, 
+            'annual_budget': b,
+            'actual': a,
+            'variance': v,
+            'variance_pct': pct,
+            'status': st
+        })        
     return data
 
 def get_budget_progress(db: Session, year: int, month: int, include_excluded=False):
@@ -273,38 +347,52 @@ def get_budget_progress(db: Session, year: int, month: int, include_excluded=Fal
     else:
         end_date = datetime(year, month + 1, 1)
         
-    # 1. Get Actuals (Expenses grouped by Section)
-    actuals_query = db.query(
-        Category.section,
-        func.sum(Transaction.amount)
-    ).join(Category, Transaction.category_id == Category.id)\
-     .filter(Transaction.date >= start_date, Transaction.date < end_date)\
-     .filter(Transaction.amount < 0)
+    # Actuals (Expenses grouped by Section) and Budgets (ANNUAL, grouped by Section)
+    # are merged by SQLite in one statement (see _merge_section_budgets).
+    if include_excluded:
+        actuals_query = select(
+            Category.section.label('section'),
+            func.sum(Transaction.amount).label('spent')
+        ).select_from(Transaction).join(Category, Transaction.category_id == Category.id)\
+         .where(Transaction.date >= start_date, Transaction.date < end_date)\
+         .where(Transaction.amount < 0)
+    else:
+        # Non-excluded expense totals come from tx_rollup_month
+        actuals_query = select(
+            Category.section.label('section'),
+            func.sum(TxRollupMonth.spend_amount).label('spent')
+        ).select_from(TxRollupMonth).join(Category, TxRollupMonth.category_id == Category.id)\
+         .where(TxRollupMonth.month == f"{year:04d}-{month:02d}", TxRollupMonth.is_excluded == False)
 
-    if not include_excluded:
-        actuals_query = actuals_query.filter(Transaction.is_excluded == False)
+    actuals = actuals_query.group_by(Category.section).cte('section_actuals')
+    return _progress_rows(db.execute(_merge_section_budgets(actuals).order_by('section')))
 
-    actuals_res = actuals_query.group_by(Category.section).all()
-     
-    actual_map = {r[0]: abs(r[1]) for r in actuals_res}
-    
-    # 2. Get Budgets (grouped by Section) - ANNUAL
-    budget_res = db.query(
-        Category.section,
-        func.sum(Budget.amount)
-    ).join(Category, Budget.scsc_id == Category.id)\
-     .group_by(Category.section).all()
-     
-    # Convert Annual to Monthly
-    budget_map = {r[0]: (r[1] / 12) for r in budget_res}
-    
-    # 3. Merge
-    all_sections = set(actual_map.keys()) | set(budget_map.keys())
-    
+def _merge_section_budgets(actuals):
+    """
+    (section, spent, annual_budget) rows for a (section, spent) CTE merged with the
+    per-section Budgets: a full outer join emulated as actuals LEFT JOIN budgets,
+    UNION ALL budgets with no actuals.
+    """
+    budgets = select(
+        Category.section.label('section'),
+        func.sum(Budget.amount).label('budget')
+    ).select_from(Budget).join(Category, Budget.scsc_id == Category.id)\
+     .group_by(Category.section).cte('section_budgets')
+
+    return union_all(
+        select(actuals.c.section, actuals.c.spent, budgets.c.budget)
+            .select_from(actuals.outerjoin(budgets, actuals.c.section == budgets.c.section)),
+        select(budgets.c.section, null(), budgets.c.budget)
+            .where(budgets.c.section.not_in(select(actuals.c.section)))
+    )
+
+def _progress_rows(rows):
+    """Shape (section, spent, annual_budget) rows into budget progress dicts."""
     progress_data = []
-    for section in sorted(list(all_sections)):
-        spent = actual_map.get(section, 0.0)
-        target = budget_map.get(section, 0.0)
+    for section, spent, annual_budget in rows:
+        spent = abs(spent) if spent is not None else 0.0
+        # Convert Annual to Monthly
+        target = annual_budget / 12 if annual_budget is not None else 0.0
         
         if spent < 0.01 and target < 0.01:
             continue
@@ -317,3 +405,57 @@ def get_budget_progress(db: Session, year: int, month: int, include_excluded=Fal
         })
         
     return progress_data
+
+# --- Dashboard ---
+
+def get_dashboard_bundle(db: Session, year: int, month: int, include_excluded=False):
+    """
+    Category breakdown and budget progress for one month in a single statement,
+    both computed from one pass over the month's per-category totals.
+    Returns {'category_breakdown': DataFrame, 'budget_progress': list}, shaped
+    like get_category_breakdown and get_budget_progress.
+    """
+    if include_excluded:
+        start_date = datetime(year, month, 1)
+        end_date = start_date + relativedelta(months=1)
+        totals = select(
+            Category.section.label('section'),
+            Category.category.label('category'),
+            func.sum(Transaction.amount).label('net'),
+            _sum_amount_where(Transaction.amount < 0).label('spent')
+        ).select_from(Transaction).join(Category, Transaction.category_id == Category.id)\
+         .where(Transaction.date >= start_date, Transaction.date < end_date)
+    else:
+        totals = select(
+            Category.section.label('section'),
+            Category.category.label('category'),
+            func.sum(TxRollupMonth.net_amount).label('net'),
+            func.sum(TxRollupMonth.spend_amount).label('spent')
+        ).select_from(TxRollupMonth).join(Category, TxRollupMonth.category_id == Category.id)\
+         .where(TxRollupMonth.month == f"{year:04d}-{month:02d}", TxRollupMonth.is_excluded == False)
+    totals = totals.group_by(Category.section, Category.category).cte('month_category_totals')
+
+    actuals = select(totals.c.section, func.sum(totals.c.spent).label('spent'))\
+        .group_by(totals.c.section).cte('section_actuals')
+    progress = _merge_section_budgets(actuals).subquery('section_progress')
+
+    # Both result sets in one round trip, tagged by kind
+    bundle = union_all(
+        select(literal('breakdown').label('kind'), totals.c.section, totals.c.category,
+               (-totals.c.net).label('value'), null().label('budget'))
+            .where(totals.c.net < 0),
+        select(literal('progress'), progress.c.section, null(), progress.c.spent, progress.c.budget)
+    ).order_by('kind', 'section', 'category')
+
+    breakdown = []
+    progress_rows = []
+    for kind, section, category, value, budget in db.execute(bundle):
+        if kind == 'breakdown':
+            breakdown.append((section, category, value))
+        else:
+            progress_rows.append((section, value, budget))
+
+    return {
+        'category_breakdown': pd.DataFrame(breakdown, columns=['section', 'category', 'amount']),
+        'budget_progress': _progress_rows(progress_rows),
+    }
@@ -1,12 +1,72 @@
-import shutil
+import sqlite3
 import os
-import glob
+import heapq
+import time
 from datetime import datetime, date
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _sqlite_backup(db_path: str, backup_path: str):
+    """
+    Copy the database with SQLite's online backup API, which is consistent
+    even while the app has the (WAL-mode) database open.
+    Writes to a temp file first so an interrupted backup never leaves a partial file.
+    A hardlink would share the live file's inode (later writes would change the
+    "backup"), and a reflink/file copy of a WAL database can miss committed pages
+    still in the -wal file, so neither is used here.
+    """
+    tmp_path = backup_path + ".tmp"
+    started = time.time()
+    src = sqlite3.connect(db_path)
+    try:
+        dst = sqlite3.connect(tmp_path)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+    finally:
+        src.close()
+    # Stamp the backup with its start time: any write the snapshot might have
+    # missed then leaves the database newer than the backup (see _is_unchanged_since)
+    os.utime(tmp_path, (started, started))
+    os.replace(tmp_path, backup_path)
+
+def backup_before_migration(db_path: str, backup_dir: str, version: int) -> str:
+    """
+    Synchronous copy of the database taken right before data migration `version`
+    rewrites rows. The name is outside the daily YYYY-MM-DD_filename pattern, so
+    retention pruning never removes it. Returns the backup path.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    backup_path = os.path.join(backup_dir, f"{os.path.basename(db_path)}.pre-migration-{version}")
+    _sqlite_backup(db_path, backup_path)
+    logger.info(f"Pre-migration backup written to: {backup_path}")
+    return backup_path
+
+def _list_backups(backup_dir: str, base_name: str) -> list:
+    """DirEntry for each backup of `base_name` (named YYYY-MM-DD_filename, so name order is date order)."""
+    suffix = f"_{base_name}"
+    with os.scandir(backup_dir) as it:
+        return [e for e in it if e.name.endswith(suffix) and not e.name.startswith('.')]
+
+def _is_unchanged_since(db_path: str, backup: os.DirEntry) -> bool:
+    """True if neither the database nor its WAL file was modified after `backup` was taken."""
+    db_mtime = os.stat(db_path).st_mtime
+    wal_path = db_path + "-wal"
+    if os.path.exists(wal_path):
+        db_mtime = max(db_mtime, os.stat(wal_path).st_mtime)
+    return db_mtime < backup.stat().st_mtime
+
+def _try_link(src: str, dst: str) -> bool:
+    """Hardlink dst to src; False if the filesystem can't (caller falls back to a full copy)."""
+    try:
+        os.link(src, dst)
+        return True
+    except OSError:
+        return False
+
 def perform_daily_backup(db_path: str, backup_dir: str = "backups", retention_days: int = 30):
     """
     Creates a copy of the database file in the backup folder if one for today doesn't exist.
@@ -30,21 +90,27 @@ def perform_daily_backup(db_path: str, backup_dir: str = "backups", retention_da
         logger.info(f"Backup for today already exists: {backup_path}")
     else:
         try:
-            shutil.copy2(db_path, backup_path)
-            logger.info(f"Database backed up successfully to: {backup_path}")
+            # Idle since the last backup: link to it instead of copying the whole file again.
+            # Backups are never written after creation, so sharing the inode is safe.
+            latest = max(_list_backups(backup_dir, base_name), key=lambda e: e.name, default=None)
+            if latest is not None and _is_unchanged_since(db_path, latest) and _try_link(latest.path, backup_path):
+                logger.info(f"Database unchanged since {latest.name}; linked backup to: {backup_path}")
+            else:
+                _sqlite_backup(db_path, backup_path)
+                logger.info(f"Database backed up successfully to: {backup_path}")
         except Exception as e:
             logger.error(f"Failed to backup database: {e}")
 
     # 2. Prune Old Backups
     try:
-        # Pattern matching specific to our naming convention: YYYY-MM-DD_filename
-        search_pattern = os.path.join(backup_dir, f"*_{base_name}")
-        backups = sorted(glob.glob(search_pattern))
+        backups = _list_backups(backup_dir, base_name)
         
-        while len(backups) > retention_days:
-            oldest_backup = backups.pop(0)
-            os.remove(oldest_backup)
-            logger.info(f"Pruned old backup: {oldest_backup}")
+        # Only the oldest surplus entries are needed, not a full sort
+        excess = len(backups) - retention_days
+        if excess > 0:
+            for entry in heapq.nsmallest(excess, backups, key=lambda e: e.name):
+                os.remove(entry.path)
+                logger.info(f"Pruned old backup: {entry.path}")
             
     except Exception as e:
         logger.error(f"Error pruning backups: {e}")
@@ -1,10 +1,20 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, bindparam, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from database.models import Budget, Category
 from database.connection import get_db, SessionLocal
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import logging
+import re
+
+# Statements built once at import; only the bound parameters change per call
+_SELECT_CATEGORY_ID = select(Category.id).where(Category.id == bindparam('sid'))
+_SELECT_ALL_BUDGETS = select(Budget).order_by(Budget.scsc_id)
+
+# Currency formatting stripped from budget amounts before parsing
+_AMOUNT_STRIP_RE = re.compile(r'[$,]')
 
 class BudgetService:
     @staticmethod
@@ -20,8 +30,7 @@ class BudgetService:
             close_session = True
             
         try:
-            stmt = select(Budget).order_by(Budget.scsc_id)
-            results = db.execute(stmt).scalars().all()
+            results = db.execute(_SELECT_ALL_BUDGETS).scalars().all()
             return results
         finally:
             if close_session:
@@ -44,29 +53,23 @@ class BudgetService:
             close_session = True
             
         try:
-            stmt = select(Budget).where(Budget.scsc_id == scsc_id)
-            budget = db.execute(stmt).scalars().first()
+            if db.execute(_SELECT_CATEGORY_ID, {'sid': scsc_id}).first() is None:
+                raise ValueError(f"Category {scsc_id} does not exist.")
             
-            if budget:
-                budget.amount = float(amount)
-                if note is not None:
-                    budget.note = note
-                budget.updated_at = datetime.utcnow()
-            else:
-                # Validate scsc_id exists?
-                cat_stmt = select(Category).where(Category.id == scsc_id)
-                cat = db.execute(cat_stmt).scalars().first()
-                if not cat:
-                    raise ValueError(f"Category {scsc_id} does not exist.")
-                
-                budget = Budget(
-                    scsc_id=scsc_id,
-                    amount=float(amount),
-                    note=note,
-                    created_at=datetime.utcnow(),
-                    updated_at=datetime.utcnow()
-                )
-                db.add(budget)
+            # Insert or update in one statement (scsc_id is unique)
+            now = datetime.utcnow()
+            changes = {'amount': float(amount), 'updated_at': now}
+            if note is not None:
+                changes['note'] = note
+            stmt = sqlite_insert(Budget).values(
+                scsc_id=scsc_id,
+                amount=float(amount),
+                note=note,
+                created_at=now,
+                updated_at=now
+            ).on_conflict_do_update(index_elements=[Budget.scsc_id], set_=changes)\
+             .returning(Budget)
+            budget = db.scalars(stmt, execution_options={"populate_existing": True}).one()
             
             db.commit()
             db.refresh(budget)
@@ -78,6 +81,48 @@ class BudgetService:
             if close_session:
                 db.close()
 
+    @staticmethod
+    def update_budgets(entries: dict, db: Session = None) -> int:
+        """
+        Update or Create several budget entries at once: {scsc_id: (amount, note)}.
+        Category IDs are validated with one IN query and every row is upserted in
+        a single statement and commit. A None note leaves the existing note as is.
+        Returns the number of entries saved.
+        """
+        if not entries:
+            return 0
+
+        close_session = False
+        if db is None:
+            db = SessionLocal()
+            close_session = True
+            
+        try:
+            known = set(db.scalars(select(Category.id).where(Category.id.in_(list(entries)))).all())
+            unknown = [scsc_id for scsc_id in entries if scsc_id not in known]
+            if unknown:
+                raise ValueError(f"Categories do not exist: {', '.join(map(str, unknown))}")
+            
+            now = datetime.utcnow()
+            stmt = sqlite_insert(Budget)
+            stmt = stmt.on_conflict_do_update(index_elements=[Budget.scsc_id], set_={
+                'amount': stmt.excluded.amount,
+                'note': func.coalesce(stmt.excluded.note, Budget.note),
+                'updated_at': stmt.excluded.updated_at,
+            })
+            db.execute(stmt, [
+                {'scsc_id': scsc_id, 'amount': float(amount), 'note': note, 'created_at': now, 'updated_at': now}
+                for scsc_id, (amount, note) in entries.items()
+            ])
+            db.commit()
+            return len(entries)
+        except Exception as e:
+            db.rollback()
+            raise e
+        finally:
+            if close_session:
+                db.close()
+
     @staticmethod
     def import_budget_csv(df: pd.DataFrame, dry_run: bool = False, db: Session = None) -> dict:
         """
@@ -116,8 +161,10 @@ class BudgetService:
             }
             df.rename(columns=col_map, inplace=True)
 
-            # 2. Get All Categories for Lookup
-            categories = db.execute(select(Category)).scalars().all()
+            # 2. Get All Categories for Lookup (only the columns the lookup needs)
+            categories = db.execute(
+                select(Category.id, Category.section, Category.category, Category.subcategory)
+            ).all()
             
             # Map (Section, Cat, Subcat) -> SCSC_ID
             cat_map = {}
@@ -132,42 +179,53 @@ class BudgetService:
             # Set of valid IDs
             valid_ids = {c.id for c in categories}
             
-            to_commit = []
+            # Existing budgets, loaded once: {scsc_id: Budget}
+            existing_budgets = {b.scsc_id: b for b in db.execute(select(Budget)).scalars().all()}
+            new_rows = []
             
-            # 3. Process Rows
-            for index, row in df.iterrows():
+            # 3. Parse amounts and resolve IDs column-wise
+            def text_col(name, default=''):
+                # str() per cell, as the row-wise parser did (NaN -> 'nan')
+                if name in df.columns:
+                    return df[name].map(str)
+                return pd.Series(default, index=df.index, dtype=object)
+
+            amount_str = text_col('amount', '0').str.replace(_AMOUNT_STRIP_RE, '', regex=True)
+            amounts = pd.to_numeric(amount_str, errors='coerce').to_numpy(dtype=float, copy=True)
+            invalid_amount = np.zeros(len(df), dtype=bool)
+            # to_numeric rejects a few strings float() accepts (e.g. padded with spaces); retry just those
+            for i in np.flatnonzero(np.isnan(amounts)):
                 try:
-                    scsc_id = None
-                    amount = 0.0
-                    
-                    # Parse Amount
-                    try:
-                        val = str(row.get('amount', 0)).replace('$', '').replace(',', '')
-                        amount = float(val)
-                        if amount < 0:
-                            results["warnings"].append(f"Row {index}: Negative budget amount cast to positive or allowed?")
-                    except:
+                    amounts[i] = float(amount_str.iat[i])
+                except ValueError:
+                    invalid_amount[i] = True
+
+            if 'scsc_id' in df.columns:
+                cand_ids = df['scsc_id'].map(str).str.strip().where(df['scsc_id'].notna())
+            else:
+                cand_ids = pd.Series(None, index=df.index, dtype=object)
+
+            # Subcategory handles NaN
+            sub = text_col('subcategory')
+            sub = sub.where(sub != 'nan', '')
+            keys = zip(
+                text_col('section').str.strip().str.lower(),
+                text_col('category').str.strip().str.lower(),
+                sub.str.strip().str.lower()
+            )
+            resolved_ids = [
+                cand if cand in valid_ids else cat_map.get(key)
+                for cand, key in zip(cand_ids, keys)
+            ]
+
+            # 4. Process Rows
+            for index, amount, bad_amount, scsc_id in zip(df.index, amounts.tolist(), invalid_amount, resolved_ids):
+                try:
+                    if bad_amount:
                         results["errors"].append({"row": index, "reason": "Invalid amount"})
                         continue
-
-                    # Resolve ID
-                    if 'scsc_id' in row and pd.notna(row['scsc_id']):
-                        cand_id = str(row['scsc_id']).strip()
-                        if cand_id in valid_ids:
-                            scsc_id = cand_id
-                    
-                    if not scsc_id:
-                        # Try lookup
-                        s = str(row.get('section', '')).strip().lower()
-                        c = str(row.get('category', '')).strip().lower()
-                        # Subcategory handles NaN
-                        sub = str(row.get('subcategory', ''))
-                        if sub == 'nan': sub = ""
-                        sub = sub.strip().lower()
-                        
-                        key = (s, c, sub)
-                        if key in cat_map:
-                            scsc_id = cat_map[key]
+                    if amount < 0:
+                        results["warnings"].append(f"Row {index}: Negative budget amount cast to positive or allowed?")
                     
                     if not scsc_id:
                         results["skipped"] += 1
@@ -175,30 +233,37 @@ class BudgetService:
                         continue
                         
                     # Prepare Object
-                    # Check if exists for stats
-                    existing = db.execute(select(Budget).where(Budget.scsc_id == scsc_id)).scalars().first()
+                    existing = existing_budgets.get(scsc_id)
                     is_update = existing is not None
                     
-                    if dry_run:
-                        # For preview, we just tally
+                    if not dry_run:
+                        now = datetime.utcnow()
                         if is_update:
-                            results["updated"] += 1
+                            existing.amount = amount
+                            existing.updated_at = now
                         else:
-                            results["inserted"] += 1
+                            budget = Budget(scsc_id=scsc_id, amount=amount, created_at=now, updated_at=now)
+                            new_rows.append(budget)
+                            # Later rows for the same category update this one
+                            existing_budgets[scsc_id] = budget
+                    
+                    if is_update:
+                        results["updated"] += 1
                     else:
-                        BudgetService.update_budget(scsc_id, amount, db=db)
-                        if is_update:
-                            results["updated"] += 1
-                        else:
-                            results["inserted"] += 1
+                        results["inserted"] += 1
 
                 except Exception as e:
                     results["errors"].append({"row": index, "reason": str(e)})
             
             if dry_run:
                 results["preview"] = df.head() # Simple preview
+            else:
+                # One flush + commit for the whole file
+                db.add_all(new_rows)
+                db.commit()
 
         except Exception as e:
+            db.rollback()
             results["success"] = False
             results["errors"].append({"reason": f"Global Error: {str(e)}"})
         finally:
@@ -217,15 +282,11 @@ class BudgetService:
             db = SessionLocal()
             close_session = True
         try:
-            # Join Budget and Category
-            stmt = select(Category.section, Budget.amount)\
-                   .join(Budget, Category.id == Budget.scsc_id)
-            rows = db.execute(stmt).all()
-            
-            summary = {}
-            for section, amount in rows:
-                summary[section] = summary.get(section, 0) + amount
-            return summary
+            # Summed per section by SQLite: one row per section
+            stmt = select(Category.section, func.sum(Budget.amount))\
+                   .join(Budget, Category.id == Budget.scsc_id)\
+                   .group_by(Category.section)
+            return dict(db.execute(stmt).all())
         finally:
             if close_session:
                 db.close()
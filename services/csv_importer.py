@@ -4,6 +4,18 @@ from sqlalchemy.orm import Session
 from database.models import MerchantMap, CategoryMap, Category
 import os
 
+# Rows parsed per read_csv chunk, so memory stays bounded for large files
+CSV_CHUNK_SIZE = 10000
+
+def _iter_csv_rows(file_path: str, usecols: list):
+    """
+    Yield (index, row) for every CSV row, reading CSV_CHUNK_SIZE rows at a time.
+    Values are read as strings (no type inference); empty cells are NaN.
+    """
+    with pd.read_csv(file_path, usecols=usecols, dtype=str, chunksize=CSV_CHUNK_SIZE) as reader:
+        for chunk in reader:
+            yield from chunk.iterrows()
+
 def import_merchant_map_csv(
     db: Session,
     file_path: str,
@@ -14,12 +26,13 @@ def import_merchant_map_csv(
     Import merchant mapping CSV into merchant_map table.
     """
     try:
-        df = pd.read_csv(file_path)
+        # Header only; the rows are streamed below
+        columns = pd.read_csv(file_path, nrows=0).columns
     except Exception as e:
         return {'success': False, 'error': str(e)}
     
     # Detect columns
-    cols_lower = {c.lower().strip(): c for c in df.columns}
+    cols_lower = {c.lower().strip(): c for c in columns}
     raw_col = cols_lower.get('raw_description') or cols_lower.get('description')
     std_col = cols_lower.get('standardized_merchant') or cols_lower.get('merchant') or cols_lower.get('standardized_name')
     
@@ -32,56 +45,70 @@ def import_merchant_map_csv(
     skips = 0
     
     preview_rows = []
+    
+    # Existing maps loaded once, keyed like the unique column. Rows added below are
+    # registered too, so a repeated key later in the file counts as existing.
+    existing_maps = {m.raw_description: m for m in db.query(MerchantMap).all()}
+    new_rows = []
 
-    for idx, row in df.iterrows():
-        try:
-            raw_desc = str(row[raw_col]).strip()
-            std_merch = str(row[std_col]).strip()
+    total_rows = 0
+    try:
+        for idx, row in _iter_csv_rows(file_path, [raw_col, std_col]):
+            total_rows += 1
+            try:
+                raw_desc = str(row[raw_col]).strip()
+                std_merch = str(row[std_col]).strip()
             
-            if not raw_desc or not std_merch or raw_desc.lower() == 'nan' or std_merch.lower() == 'nan':
-                skips += 1
-                continue
+                if not raw_desc or not std_merch or raw_desc.lower() == 'nan' or std_merch.lower() == 'nan':
+                    skips += 1
+                    continue
             
-            # Check existing
-            existing = db.query(MerchantMap).filter(MerchantMap.raw_description == raw_desc).first()
+                # Check existing
+                existing = existing_maps.get(raw_desc)
             
-            action = "skip"
-            if existing:
-                if replace_existing:
-                    action = "update"
-                    updates += 1
-                    if not dry_run:
-                        existing.standardized_merchant = std_merch
-                        existing.updated_at = datetime.utcnow()
+                action = "skip"
+                if existing:
+                    if replace_existing:
+                        action = "update"
+                        updates += 1
+                        if not dry_run:
+                            existing.standardized_merchant = std_merch
+                            existing.updated_at = datetime.utcnow()
+                    else:
+                        skips += 1
                 else:
-                    skips += 1
-            else:
-                action = "insert"
-                inserts += 1
-                if not dry_run:
+                    action = "insert"
+                    inserts += 1
                     new_map = MerchantMap(
                         raw_description=raw_desc,
                         standardized_merchant=std_merch,
                         created_at=datetime.utcnow()
                     )
-                    db.add(new_map)
+                    existing_maps[raw_desc] = new_map
+                    if not dry_run:
+                        new_rows.append(new_map)
             
-            if dry_run:
-                preview_rows.append({
-                    'raw_description': raw_desc,
-                    'standardized_merchant': std_merch,
-                    'action': action
-                })
+                if dry_run:
+                    preview_rows.append({
+                        'raw_description': raw_desc,
+                        'standardized_merchant': std_merch,
+                        'action': action
+                    })
+
+            except Exception as e:
+                errors.append({'row': idx, 'error': str(e)})
+    except Exception as e:
+        # Malformed CSV further down the file; nothing has been committed yet
+        db.rollback()
+        return {'success': False, 'error': str(e)}
 
-        except Exception as e:
-            errors.append({'row': idx, 'error': str(e)})
-    
     if not dry_run:
+        db.add_all(new_rows)
         db.commit()
     
     return {
         'success': True,
-        'total_rows': len(df),
+        'total_rows': total_rows,
         'inserted': inserts,
         'updated': updates,
         'skipped': skips,
@@ -99,12 +126,13 @@ def import_category_map_csv(
     Import category mapping CSV into category_map table.
     """
     try:
-        df = pd.read_csv(file_path)
+        # Header only; the rows are streamed below
+        columns = pd.read_csv(file_path, nrows=0).columns
     except Exception as e:
         return {'success': False, 'error': str(e)}
     
     # Detect columns
-    cols_lower = {c.lower().strip(): c for c in df.columns}
+    cols_lower = {c.lower().strip(): c for c in columns}
     unmapped_col = cols_lower.get('unmapped_description') or cols_lower.get('description') or cols_lower.get('merchant')
     scsc_col = cols_lower.get('scsc_id') or cols_lower.get('id') or cols_lower.get('category_id')
     
@@ -120,54 +148,67 @@ def import_category_map_csv(
     skips = 0
     preview_rows = []
     
-    for idx, row in df.iterrows():
-        try:
-            desc = str(row[unmapped_col]).strip()
-            cat_id = str(row[scsc_col]).strip()
+    # Existing maps loaded once (see import_merchant_map_csv)
+    existing_maps = {m.unmapped_description: m for m in db.query(CategoryMap).all()}
+    new_rows = []
+    
+    total_rows = 0
+    try:
+        for idx, row in _iter_csv_rows(file_path, [unmapped_col, scsc_col]):
+            total_rows += 1
+            try:
+                desc = str(row[unmapped_col]).strip()
+                cat_id = str(row[scsc_col]).strip()
             
-            if not desc or not cat_id or desc.lower() == 'nan': 
-                continue
+                if not desc or not cat_id or desc.lower() == 'nan': 
+                    continue
 
-            if cat_id not in valid_ids:
-                errors.append({'row': idx, 'error': f"Invalid SCSC_ID: {cat_id}"})
-                continue
+                if cat_id not in valid_ids:
+                    errors.append({'row': idx, 'error': f"Invalid SCSC_ID: {cat_id}"})
+                    continue
                 
-            existing = db.query(CategoryMap).filter(CategoryMap.unmapped_description == desc).first()
+                existing = existing_maps.get(desc)
             
-            action = "skip"
-            if existing:
-                if replace_existing:
-                    action = "update"
-                    updates += 1
-                    if not dry_run:
-                        existing.scsc_id = cat_id
-                        existing.updated_at = datetime.utcnow()
+                action = "skip"
+                if existing:
+                    if replace_existing:
+                        action = "update"
+                        updates += 1
+                        if not dry_run:
+                            existing.scsc_id = cat_id
+                            existing.updated_at = datetime.utcnow()
+                    else:
+                        skips += 1
                 else:
-                    skips += 1
-            else:
-                action = "insert"
-                inserts += 1
-                if not dry_run:
+                    action = "insert"
+                    inserts += 1
                     new_map = CategoryMap(
                         unmapped_description=desc,
                         scsc_id=cat_id,
                         source='import',
                         created_at=datetime.utcnow()
                     )
-                    db.add(new_map)
+                    existing_maps[desc] = new_map
+                    if not dry_run:
+                        new_rows.append(new_map)
 
-            if dry_run:
-                preview_rows.append({'description': desc, 'scsc_id': cat_id, 'action': action})
+                if dry_run:
+                    preview_rows.append({'description': desc, 'scsc_id': cat_id, 'action': action})
 
-        except Exception as e:
-            errors.append({'row': idx, 'error': str(e)})
+            except Exception as e:
+                errors.append({'row': idx, 'error': str(e)})
+    except Exception as e:
+        # Malformed CSV (see import_merchant_map_csv)
+        db.rollback()
+        return {'success': False, 'error': str(e)}
 
     if not dry_run:
+        db.add_all(new_rows)
         db.commit()
 
     return {
         'success': True,
-        'total_rows': len(df),
+        'total_rows': total_rows,
         'inserted': inserts,
         'updated': updates,
         'skipped': skips,
@@ -186,11 +227,12 @@ def import_category_taxonomy_csv(
     Expected columns: ID, Section, Category, Subcategory
     """
     try:
-        df = pd.read_csv(file_path)
+        # Header only; the rows are streamed below
+        columns = pd.read_csv(file_path, nrows=0).columns
     except Exception as e:
         return {'success': False, 'error': str(e)}
         
-    cols_lower = {c.lower().strip(): c for c in df.columns}
+    cols_lower = {c.lower().strip(): c for c in columns}
     id_col = cols_lower.get('id') or cols_lower.get('scsc_id')
     sec_col = cols_lower.get('section')
     cat_col = cols_lower.get('category')
@@ -205,60 +247,73 @@ def import_category_taxonomy_csv(
     skips = 0
     preview_rows = []
     
-    for idx, row in df.iterrows():
-        try:
-            cat_id = str(row[id_col]).strip()
-            section = str(row[sec_col]).strip()
-            category = str(row[cat_col]).strip()
-            subcategory = str(row[sub_col]).strip() if sub_col and pd.notna(row[sub_col]) else None
+    # Existing categories loaded once (see import_merchant_map_csv)
+    existing_cats = {c.id: c for c in db.query(Category).all()}
+    new_rows = []
+    
+    total_rows = 0
+    try:
+        for idx, row in _iter_csv_rows(file_path, [c for c in (id_col, sec_col, cat_col, sub_col) if c]):
+            total_rows += 1
+            try:
+                cat_id = str(row[id_col]).strip()
+                section = str(row[sec_col]).strip()
+                category = str(row[cat_col]).strip()
+                subcategory = str(row[sub_col]).strip() if sub_col and pd.notna(row[sub_col]) else None
             
-            if not cat_id or not section or not category:
-                continue
+                if not cat_id or not section or not category:
+                    continue
                 
-            existing = db.query(Category).filter(Category.id == cat_id).first()
+                existing = existing_cats.get(cat_id)
             
-            action = "skip"
-            if existing:
-                if replace_existing:
-                    action = "update"
-                    updates += 1
-                    if not dry_run:
-                        existing.section = section
-                        existing.category = category
-                        existing.subcategory = subcategory
-                        # No updated_at on Category model currently, but that's fine
+                action = "skip"
+                if existing:
+                    if replace_existing:
+                        action = "update"
+                        updates += 1
+                        if not dry_run:
+                            existing.section = section
+                            existing.category = category
+                            existing.subcategory = subcategory
+                            # No updated_at on Category model currently, but that's fine
+                    else:
+                        skips += 1
                 else:
-                    skips += 1
-            else:
-                action = "insert"
-                inserts += 1
-                if not dry_run:
+                    action = "insert"
+                    inserts += 1
                     new_cat = Category(
                         id=cat_id,
                         section=section,
                         category=category,
                         subcategory=subcategory
                     )
-                    db.add(new_cat)
+                    existing_cats[cat_id] = new_cat
+                    if not dry_run:
+                        new_rows.append(new_cat)
                     
-            if dry_run:
-                preview_rows.append({
-                    'id': cat_id, 
-                    'section': section, 
-                    'cat': category, 
-                    'sub': subcategory, 
-                    'action': action
-                })
+                if dry_run:
+                    preview_rows.append({
+                        'id': cat_id, 
+                        'section': section, 
+                        'cat': category, 
+                        'sub': subcategory, 
+                        'action': action
+                    })
 
-        except Exception as e:
-            errors.append({'row': idx, 'error': str(e)})
+            except Exception as e:
+                errors.append({'row': idx, 'error': str(e)})
+    except Exception as e:
+        # Malformed CSV (see import_merchant_map_csv)
+        db.rollback()
+        return {'success': False, 'error': str(e)}
 
     if not dry_run:
+        db.add_all(new_rows)
         db.commit()
     
     return {
         'success': True,
-        'total_rows': len(df),
+        'total_rows': total_rows,
         'inserted': inserts,
         'updated': updates,
         'skipped': skips,
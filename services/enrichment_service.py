@@ -1,8 +1,14 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import or_, func
 from database.models import Transaction, MerchantMap, CategoryMap, Category
 import re
 
+# Transactions enriched per query/commit in enrich_all_new_transactions
+ENRICH_BATCH_SIZE = 1000
+
+# Store numbers (e.g. #123, # 123), compiled once for per-transaction cleaning
+_STORE_NUM_RE = re.compile(r'#\s*\d+')
+
 def clean_description_regex(raw_desc: str) -> str:
     """
     Cleans a raw bank description using regex to remove common noise.
@@ -13,7 +19,7 @@ def clean_description_regex(raw_desc: str) -> str:
     
     # 1. Remove common noise
     # Remove Store Numbers (e.g. #123, # 123)
-    val = re.sub(r'#\s*\d+', '', raw_desc)
+    val = _STORE_NUM_RE.sub('', raw_desc)
     # Remove specific location codes if needed (simple version)
     # Remove 'Debit Card Purchase' etc (Generic)
     
@@ -24,33 +30,78 @@ def clean_description_regex(raw_desc: str) -> str:
     # e.g., Title Case
     return val.strip().title()
 
-def enrich_transaction(db: Session, transaction: Transaction) -> Transaction:
+class _QueryLookup:
+    """
+    Dict-like .get() backed by one indexed query per key, for enriching a single
+    transaction without loading whole map tables. With `lowered`, the (already
+    lower-cased) key is matched against lower(column) via the ix_*_lower indexes.
+    """
+    def __init__(self, db: Session, model, column, lowered: bool = False):
+        self.db = db
+        self.model = model
+        self.column = func.lower(column) if lowered else column
+
+    def get(self, key):
+        return self.db.query(self.model).filter(self.column == key).order_by(self.model.id).first()
+
+def query_enrichment_maps(db: Session) -> dict:
+    """Same lookups as load_enrichment_maps, answered by the database per key."""
+    return {
+        'merchant_by_raw': _QueryLookup(db, MerchantMap, MerchantMap.raw_description),
+        'merchant_by_std': _QueryLookup(db, MerchantMap, MerchantMap.standardized_merchant, lowered=True),
+        'category_by_desc': _QueryLookup(db, CategoryMap, CategoryMap.unmapped_description, lowered=True),
+    }
+
+def load_enrichment_maps(db: Session) -> dict:
+    """
+    Load MerchantMap and CategoryMap once into dicts for enrich_transaction.
+    Keys mirror the old per-transaction queries: exact raw_description, and
+    case-insensitive standardized_merchant / unmapped_description. Where several
+    rows share a key the lowest id wins.
+    """
+    merchant_by_raw = {}
+    merchant_by_std = {}
+    for m in db.query(MerchantMap).order_by(MerchantMap.id):
+        merchant_by_raw.setdefault(m.raw_description, m)
+        merchant_by_std.setdefault(m.standardized_merchant.lower(), m)
+
+    category_by_desc = {}
+    for c in db.query(CategoryMap).order_by(CategoryMap.id):
+        category_by_desc.setdefault(c.unmapped_description.lower(), c)
+
+    return {
+        'merchant_by_raw': merchant_by_raw,
+        'merchant_by_std': merchant_by_std,
+        'category_by_desc': category_by_desc,
+    }
+
+def enrich_transaction(db: Session, transaction: Transaction, maps: dict = None) -> Transaction:
     """
     Enrich a transaction with merchant mapping and category mapping.
+    Pass `maps` from load_enrichment_maps when enriching many transactions;
+    without it each lookup is an indexed query.
     """
+    if maps is None:
+        maps = query_enrichment_maps(db)
+
     # Step 1: Clean description if not present
     if not transaction.clean_description:
         transaction.clean_description = clean_description_regex(transaction.raw_description or transaction.description)
     
     # Step 2: Merchant mapping
-    # Look for exact match or contains
-    # Since we want performance, we check exact first, then "contains" logic if needed.
-    # The prompt suggests a combined query.
-    
+    # Exact match on raw first, then the clean description against either
+    # raw_description or (case-insensitively) standardized_merchant.
     merchant_record = None
     
-    # Try exact match on raw first (fastest)
     if transaction.raw_description:
-         merchant_record = db.query(MerchantMap).filter(MerchantMap.raw_description == transaction.raw_description).first()
+         merchant_record = maps['merchant_by_raw'].get(transaction.raw_description)
     
-    # If not found, try fuzzy/clean match
     if not merchant_record and transaction.clean_description:
-        merchant_record = db.query(MerchantMap).filter(
-            or_(
-                MerchantMap.raw_description == transaction.clean_description,
-                MerchantMap.standardized_merchant.ilike(transaction.clean_description) 
-            )
-        ).first()
+        candidates = [m for m in (
+            maps['merchant_by_raw'].get(transaction.clean_description),
+            maps['merchant_by_std'].get(transaction.clean_description.lower()),
+        ) if m is not None]
+        merchant_record = min(candidates, key=lambda m: m.id, default=None)
 
     if merchant_record:
         transaction.standardized_merchant = merchant_record.standardized_merchant
@@ -59,11 +110,8 @@ def enrich_transaction(db: Session, transaction: Transaction) -> Transaction:
         # Fallback: Use clean description as standardized merchant
         transaction.standardized_merchant = transaction.clean_description
 
-    # Step 3: Category mapping (lookup by standardized merchant)
-    # We look up using the standardized merchant name in the category map
-    category_record = db.query(CategoryMap).filter(
-        CategoryMap.unmapped_description.ilike(transaction.standardized_merchant)
-    ).first()
+    # Step 3: Category mapping (lookup by standardized merchant, case-insensitive)
+    category_record = maps['category_by_desc'].get(transaction.standardized_merchant.lower())
     
     if category_record:
         transaction.category_id = category_record.scsc_id # Map to category_id (scsc_id alias)
@@ -76,19 +124,31 @@ def enrich_transaction(db: Session, transaction: Transaction) -> Transaction:
     return transaction
 
 def enrich_all_new_transactions(db: Session):
-    """Enrich all transactions that haven't been mapped yet."""
-    # Find transactions without standardized_merchant
-    txs = db.query(Transaction).filter(
-        or_(
-            Transaction.standardized_merchant == None,
-            Transaction.category_id == None
-        )
-    ).all()
+    """
+    Enrich all transactions that haven't been mapped yet.
+    Works through them in id order, ENRICH_BATCH_SIZE at a time with a commit
+    per batch, so memory stays bounded however many rows need enriching.
+    """
+    # Transactions without standardized_merchant or category (served by ix_tx_unenriched)
+    unenriched = or_(
+        Transaction.standardized_merchant == None,
+        Transaction.category_id == None
+    )
     
+    # Both map tables loaded once instead of 2-3 queries per transaction
+    maps = load_enrichment_maps(db)
+
     count = 0
-    for t in txs:
-        enrich_transaction(db, t)
-        count += 1
+    last_id = 0
+    while True:
+        # Keyset paging on id: rows that stay unenriched after their batch aren't revisited
+        txs = db.query(Transaction).filter(unenriched, Transaction.id > last_id).order_by(Transaction.id).limit(ENRICH_BATCH_SIZE).all()
+        if not txs:
+            break
+        for t in txs:
+            enrich_transaction(db, t, maps)
+            count += 1
+        last_id = txs[-1].id
+        db.commit()
     
-    db.commit()
     return count
@@ -1,36 +1,96 @@
 import pandas as pd
-import hashlib
+import numpy as np
 from datetime import datetime
-from sqlalchemy.orm import Session
+from dataclasses import dataclass
+from sqlalchemy import select
+from sqlalchemy.orm import Session, load_only
 from sqlalchemy.exc import IntegrityError
-from database.models import Transaction, Category, MerchantMap, CategoryMap, ExclusionRule
+from database.models import Transaction, Category, MerchantMap, CategoryMap, ExclusionRule, format_amount, fingerprint_hash
+from database.connection import bulk_insert, select_in_batches
 import re
 
-def check_exclusion(description: str, rules: list) -> bool:
+# pyahocorasick is optional; it matches all 'contains' exclusion rules in one pass over a description
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+class ExclusionMatcher:
+    """
+    Active exclusion rules compiled once for matching many descriptions:
+    exact matches in a set, 'contains' values in an Aho-Corasick automaton
+    (or a plain substring loop without pyahocorasick), regexes unioned into one
+    alternation so a single scan decides them. Invalid regexes are skipped.
+    Same result as checking each rule in turn.
+    """
+    def __init__(self, rules: list):
+        self.exact = set()
+        contains = set()
+        regexes = []
+        for rule in rules:
+            if not rule.is_active:
+                continue
+            if rule.rule_type == 'exact_match':
+                self.exact.add(rule.value.lower())
+            elif rule.rule_type == 'contains':
+                contains.add(rule.value.lower())
+            elif rule.rule_type == 'regex':
+                try:
+                    regexes.append(re.compile(rule.value, re.IGNORECASE))
+                except re.error:
+                    continue # Skip invalid regex
+
+        # Patterns with capture groups stay separate (a union would renumber their
+        # backreferences), as does everything if the union itself won't compile
+        # (e.g. inline global flags are only allowed at the very start).
+        self.regexes = [rx for rx in regexes if rx.groups]
+        groupless = [rx.pattern for rx in regexes if not rx.groups]
+        self.regex_union = None
+        if groupless:
+            try:
+                self.regex_union = re.compile('|'.join(f'(?:{p})' for p in groupless), re.IGNORECASE)
+            except re.error:
+                self.regexes = regexes
+
+        # An empty 'contains' value is in every string
+        self.contains_all = '' in contains
+        contains.discard('')
+        self.contains = list(contains)
+        self.automaton = None
+        if ahocorasick is not None and self.contains:
+            self.automaton = ahocorasick.Automaton()
+            for value in self.contains:
+                self.automaton.add_word(value, value)
+            self.automaton.make_automaton()
+
+    def matches(self, description: str) -> bool:
+        desc_lower = description.lower()
+        if desc_lower in self.exact or self.contains_all:
+            return True
+        if self.automaton is not None:
+            for _ in self.automaton.iter(desc_lower):
+                return True
+        elif any(value in desc_lower for value in self.contains):
+            return True
+        if self.regex_union is not None and self.regex_union.search(description):
+            return True
+        return any(rx.search(description) for rx in self.regexes)
+
+def check_exclusion(description: str, rules) -> bool:
     """
     Checks if a description matches any exclusion rules.
-    rules: list of ExclusionRule objects
+    rules: list of ExclusionRule objects, or an ExclusionMatcher built from them
+    (build one when checking many descriptions)
     """
     if not description:
         return False
-        
-    for rule in rules:
-        if not rule.is_active:
-            continue
-            
-        if rule.rule_type == 'exact_match':
-            if rule.value.lower() == description.lower():
-                return True
-        elif rule.rule_type == 'contains': # New support
-            if rule.value.lower() in description.lower():
-                return True
-        elif rule.rule_type == 'regex':
-            try:
-                if re.search(rule.value, description, re.IGNORECASE):
-                    return True
-            except re.error:
-                continue # Skip invalid regex
-    return False
+    if not isinstance(rules, ExclusionMatcher):
+        rules = ExclusionMatcher(rules)
+    return rules.matches(description)
+
+# Only the map columns apply_mapping_rules reads
+_MERCHANT_MAP_COLS = load_only(MerchantMap.id, MerchantMap.standardized_merchant, MerchantMap.is_active)
+_CATEGORY_MAP_COLS = load_only(CategoryMap.id, CategoryMap.scsc_id, CategoryMap.is_active)
 
 def apply_mapping_rules(tx: Transaction, db: Session):
     """
@@ -44,7 +104,7 @@ def apply_mapping_rules(tx: Transaction, db: Session):
     # but currently V1 logic is exact match on `raw_description` OR we do the cleaning here.
     
     # Let's try to find an exact match first on description
-    m_map = db.query(MerchantMap).filter(MerchantMap.raw_description == tx.description).first()
+    m_map = db.query(MerchantMap).options(_MERCHANT_MAP_COLS).filter(MerchantMap.raw_description == tx.description).first()
     
     if m_map and m_map.is_active:
         tx.standardized_merchant = m_map.standardized_merchant
@@ -57,11 +117,11 @@ def apply_mapping_rules(tx: Transaction, db: Session):
 
     # 2. Categorization (Category Map)
     # Match description against CategoryMap 'unmapped_description'
-    c_map = db.query(CategoryMap).filter(CategoryMap.unmapped_description == tx.description).first()
+    c_map = db.query(CategoryMap).options(_CATEGORY_MAP_COLS).filter(CategoryMap.unmapped_description == tx.description).first()
     
     # If not found by exact desc, try by standardized merchant
     if not c_map and tx.standardized_merchant:
-        c_map = db.query(CategoryMap).filter(CategoryMap.unmapped_description == tx.standardized_merchant).first()
+        c_map = db.query(CategoryMap).options(_CATEGORY_MAP_COLS).filter(CategoryMap.unmapped_description == tx.standardized_merchant).first()
 
     if c_map and c_map.is_active:
         tx.category_id = c_map.scsc_id
@@ -69,152 +129,238 @@ def apply_mapping_rules(tx: Transaction, db: Session):
 
 def generate_fingerprint(date_dt: datetime, amount: float, description: str):
     """
-    Generates a deterministic SHA256 hash for a transaction.
+    Generates a deterministic hash (fingerprint_hash) for a transaction.
     Format: YYYY-MM-DD|AMOUNT|DESCRIPTION
     """
     date_str = date_dt.strftime("%Y-%m-%d")
     # Clean description: remove multiple spaces, strip
     desc_clean = " ".join(str(description).split()).strip()
-    raw_str = f"{date_str}|{float(amount):.2f}|{desc_clean}"
-    return hashlib.sha256(raw_str.encode('utf-8')).hexdigest()
+    raw_str = f"{date_str}|{format_amount(amount)}|{desc_clean}"
+    return fingerprint_hash(raw_str)
 
-def normalize_bank_row(row, cols_map):
+def fingerprint_strings(df: pd.DataFrame) -> list:
     """
-    Takes a dataframe row and the column map, returns a standardized dict:
-    {
-        'date': datetime,
-        'amount': float,
-        'description': str,
-        'raw_description': str,
-        'type': str,
-        'account_name': str (optional)
-    }
+    The strings generate_fingerprint hashes (YYYY-MM-DD|AMOUNT|DESCRIPTION), built
+    column-wise over a DataFrame with 'date', 'amount' and 'description' columns,
+    in row order. Equal strings <=> equal fingerprints, so they also serve as
+    dedup keys without hashing.
     """
-    # 1. DATE Parsing
-    date_val = None
-    # Priority: Transaction Date > Posting Date > Date
-    for k in ['transaction date', 'posting date', 'post date', 'date']:
-        raw_d = row.get(cols_map.get(k))
-        if pd.notna(raw_d):
-            try:
-                # pandas handles most formats (MM/DD/YYYY, YYYY-MM-DD) automatically
-                date_val = pd.to_datetime(raw_d).to_pydatetime()
-                break
-            except:
-                continue
-    
-    if not date_val:
-        return None
-
-    # 4. TYPE Parsing (Moved up to support Amount logic)
-    txn_type = ""
-    for k in ['transaction type', 'type', 'details', 'd/c', 'dr/cr', 'sign']:
-        val = row.get(cols_map.get(k))
-        if pd.notna(val):
-            txn_type = str(val).strip()
-            break
+    if df.empty:
+        return []
+    date_str = pd.to_datetime(df['date']).dt.strftime("%Y-%m-%d")
+    # format_amount per value: Series.round() rounds differently from '%.2f' on half-cents
+    amount_str = df['amount'].astype(float).map(format_amount)
+    # map(str), not astype(str): the string dtype would turn None into NaN rather than 'None'
+    desc_clean = df['description'].map(str).str.split().str.join(" ")
+    raw_strs = date_str + "|" + amount_str + "|" + desc_clean
+    return list(raw_strs.to_numpy())
 
-    # 2. AMOUNT Parsing
-    amount = 0.0
-    amount_sign_fixed = False
-    amount_parsed_successfully = False
-    
-    # Check for direct Amount column
-    amt_col = cols_map.get('amount') or cols_map.get('transaction amount')
-    if amt_col:
-        val = row.get(amt_col)
-        if pd.notna(val) and str(val).strip() != '':
-            if isinstance(val, str):
-                val = val.replace('$','').replace(',','').replace(' ','')
-                # Handle parenthesis negations (100.00) -> -100.00
-                if '(' in val and ')' in val:
-                     val = '-' + val.replace('(','').replace(')','')
-            try:
-                amount = float(val)
-                amount_parsed_successfully = True
-            except:
-                pass
-    
-    # Check for Split Debit/Credit columns (Common in BECU, Capital One)
-    # Use if Amount col was missing OR it failed to parse/was empty
-    if not amount_parsed_successfully and (cols_map.get('debit') or cols_map.get('credit')):
-        debit_val = 0.0
-        credit_val = 0.0
-        
-        # Parse Debit
-        d_col = cols_map.get('debit')
-        if d_col:
-            val = row.get(d_col)
-            if pd.notna(val) and str(val).strip() != '':
-                if isinstance(val, str):
-                    val = val.replace('$','').replace(',','')
-                try:
-                    debit_val = abs(float(val)) 
-                except:
-                    pass
-
-        # Parse Credit
-        c_col = cols_map.get('credit')
-        if c_col:
-            val = row.get(c_col)
-            if pd.notna(val) and str(val).strip() != '':
-                if isinstance(val, str):
-                    val = val.replace('$','').replace(',','')
-                try:
-                    credit_val = abs(float(val))
-                except:
-                    pass
-        
-        # Only use this if we actually found something
-        # Explicit check prevents overwriting if just one column exists but is empty
-        if debit_val != 0 or credit_val != 0:
-             amount = credit_val - debit_val
-             amount_sign_fixed = True
-        # Edge case: Both zero but columns exist - likely a $0.00 transaction or transfer
-        elif pd.notna(row.get(d_col)) or pd.notna(row.get(c_col)):
-            amount = credit_val - debit_val # 0.0
-            amount_sign_fixed = True
-
-    # SIGN CORRECTION using Type (if not already fixed by split cols)
-    if not amount_sign_fixed and amount != 0:
-        t_lower = txn_type.lower()
-        if t_lower in ['debit', 'dr', 'withdrawal', 'outflow', 'sale', 'payment', 'fee']:
-            amount = -abs(amount)
-        elif t_lower in ['credit', 'cr', 'deposit', 'inflow', 'refund']:
-            amount = abs(amount)
-
-    # 3. DESCRIPTION Parsing
-    # Priority: Description > Transaction Description > Merchant
-    desc = ""
-    for k in ['transaction description', 'description', 'merchant', 'narrative', 'memo']:
-        val = row.get(cols_map.get(k))
-        if pd.notna(val):
-            desc = str(val).strip()
-            break
-            
-    # 5. ACCOUNT NAME (Source)
-    # Some CSVs might have 'Card No.' or 'Account Number'
-    acc_name = "Imported CSV"
-    for k in ['account name', 'card no.', 'card no', 'account number']:
-        val = row.get(cols_map.get(k))
-        # SimpleFin CSV uses 'Source' as Account Name
-        s_val = row.get(cols_map.get('source'))
-        
-        if pd.notna(s_val):
-            acc_name = str(s_val).strip()
-            break
-        elif pd.notna(val):
-            acc_name = f"Account {val}"
+def generate_fingerprints(df: pd.DataFrame) -> list:
+    """
+    Vectorized generate_fingerprint over a DataFrame with 'date', 'amount'
+    and 'description' columns. Produces identical hashes, in row order.
+    """
+    return [fingerprint_hash(s) for s in fingerprint_strings(df)]
+
+# Column names tried in priority order for each normalized field
+DATE_KEYS = ['transaction date', 'posting date', 'post date', 'date']
+TYPE_KEYS = ['transaction type', 'type', 'details', 'd/c', 'dr/cr', 'sign']
+DESCRIPTION_KEYS = ['transaction description', 'description', 'merchant', 'narrative', 'memo']
+ACCOUNT_KEYS = ['account name', 'card no.', 'card no', 'account number']
+DEBIT_TYPES = ['debit', 'dr', 'withdrawal', 'outflow', 'sale', 'payment', 'fee']
+CREDIT_TYPES = ['credit', 'cr', 'deposit', 'inflow', 'refund']
+
+@dataclass(frozen=True)
+class ColumnPlan:
+    """
+    The DataFrame columns each normalized field is read from, resolved once per
+    file from the lower-cased column map. Priority fields keep every present
+    column in priority order, since a row falls through to the next column when
+    a cell is empty.
+    """
+    dates: tuple
+    types: tuple
+    amount: str
+    debit: str
+    credit: str
+    descriptions: tuple
+    source: str
+    accounts: tuple
+
+    @classmethod
+    def from_cols_map(cls, cols_map: dict) -> "ColumnPlan":
+        def present(keys):
+            return tuple(cols_map[k] for k in keys if k in cols_map)
+        return cls(
+            dates=present(DATE_KEYS),
+            types=present(TYPE_KEYS),
+            amount=cols_map.get('amount') or cols_map.get('transaction amount'),
+            debit=cols_map.get('debit'),
+            credit=cols_map.get('credit'),
+            descriptions=present(DESCRIPTION_KEYS),
+            source=cols_map.get('source'),
+            accounts=present(ACCOUNT_KEYS),
+        )
+
+# --- Cell parsers (used by normalize_bank_df) ---
+# Each returns None when the cell gives no value, so the next column in priority order is tried.
+
+def _date_cell(raw_d):
+    if pd.notna(raw_d):
+        try:
+            # pandas handles most formats (MM/DD/YYYY, YYYY-MM-DD) automatically
+            return pd.to_datetime(raw_d).to_pydatetime()
+        except:
+            pass
+    return None
+
+# Fixed formats tried for date strings in bulk. Only formats whose strict parse
+# always agrees with pd.to_datetime's own inference (month-first, 4-digit year);
+# strings matching none of them are parsed one by one.
+BULK_DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y']
+
+def _date_cells(values) -> list:
+    """_date_cell over many values, parsing strings in BULK_DATE_FORMATS with pandas' vectorized parser."""
+    out = [None] * len(values)
+    is_str = [isinstance(v, str) for v in values]
+    pending = [i for i, is_s in enumerate(is_str) if is_s]
+    for fmt in BULK_DATE_FORMATS:
+        if not pending:
             break
+        parsed = pd.to_datetime(pd.Series([values[i] for i in pending], dtype=object), format=fmt, errors='coerce')
+        ok = parsed.notna().to_numpy()
+        for i, ts in zip(np.asarray(pending)[ok], parsed[ok]):
+            out[i] = ts.to_pydatetime()
+        pending = [i for i, hit in zip(pending, ok) if not hit]
+    # Non-strings, and strings in none of the formats, exactly as a single cell
+    for i in [i for i, is_s in enumerate(is_str) if not is_s] + pending:
+        out[i] = _date_cell(values[i])
+    return out
 
-    return {
-        'date': date_val,
-        'amount': amount,
-        'description': desc,
-        'raw_description': desc, # Default raw to same as desc for CSVs
-        'type': txn_type,
-        'account_name': acc_name
-    }
+def _text_cell(val):
+    return str(val).strip() if pd.notna(val) else None
+
+def _account_number_cell(val):
+    return f"Account {val}" if pd.notna(val) else None
+
+def _amount_cell(val):
+    if pd.notna(val) and str(val).strip() != '':
+        if isinstance(val, str):
+            val = val.replace('$','').replace(',','').replace(' ','')
+            # Handle parenthesis negations (100.00) -> -100.00
+            if '(' in val and ')' in val:
+                 val = '-' + val.replace('(','').replace(')','')
+        try:
+            return float(val)
+        except:
+            pass
+    return None
+
+def _split_amount_cell(val):
+    """Debit/Credit column value as a positive float; 0.0 when empty or unparseable."""
+    if pd.notna(val) and str(val).strip() != '':
+        if isinstance(val, str):
+            val = val.replace('$','').replace(',','')
+        try:
+            return abs(float(val))
+        except:
+            pass
+    return 0.0
+
+def normalize_bank_df(df: pd.DataFrame, plan: ColumnPlan) -> pd.DataFrame:
+    """
+    Normalizes every row of a bank DataFrame. Returns a DataFrame indexed like
+    `df` with columns date, amount, description, raw_description, type and
+    account_name; rows whose date can't be parsed are left out.
+    Each distinct cell value is parsed once with the cell parsers above, and the
+    priority/sign rules run column-wise:
+    - Date: first parseable of Transaction Date > Posting Date > Date
+    - Amount: the Amount column, else Credit - Debit when either split column
+      has a value; an unsplit amount is signed by a debit/credit Type
+    - Account: Source, else the first account/card number, else "Imported CSV"
+    Column names must be unique (see import_transactions_from_df).
+    """
+    n = len(df)
+    values = df.values # the same per-cell objects iterrows hands out
+
+    def parsed(name, parse, parse_all=None):
+        # parse() applied once per distinct value of column `name` (or parse_all() to
+        # all of them at once); None if the column is absent
+        if name is None:
+            return None
+        codes, uniques = pd.factorize(values[:, df.columns.get_loc(name)], use_na_sentinel=False)
+        results = np.empty(len(uniques), dtype=object)
+        results[:] = parse_all(uniques) if parse_all else [parse(u) for u in uniques]
+        return results[codes]
+
+    def first_present(names, parse, parse_all=None):
+        # Per row, the first column (in priority order) whose parsed value isn't None
+        out = np.full(n, None, dtype=object)
+        for name in names:
+            col = parsed(name, parse, parse_all)
+            fill = (out == None) & (col != None)
+            out[fill] = col[fill]
+        return out
+
+    # 1. DATE
+    dates = first_present(plan.dates, _date_cell, _date_cells)
+    keep = np.fromiter((bool(d) for d in dates), dtype=bool, count=n)
+
+    # 4. TYPE
+    txn_type = first_present(plan.types, _text_cell)
+    txn_type[txn_type == None] = ""
+
+    # 2. AMOUNT
+    amount = np.zeros(n)
+    sign_fixed = np.zeros(n, dtype=bool)
+    parsed_ok = np.zeros(n, dtype=bool)
+    if plan.amount:
+        direct = parsed(plan.amount, _amount_cell)
+        parsed_ok = direct != None
+        amount[parsed_ok] = direct[parsed_ok].astype(float)
+
+    d_col = plan.debit
+    c_col = plan.credit
+    if d_col or c_col:
+        debit = parsed(d_col, _split_amount_cell).astype(float) if d_col else np.zeros(n)
+        credit = parsed(c_col, _split_amount_cell).astype(float) if c_col else np.zeros(n)
+        present = np.zeros(n, dtype=bool)
+        for name in (d_col, c_col):
+            if name:
+                present |= pd.notna(values[:, df.columns.get_loc(name)])
+        use_split = ~parsed_ok & ((debit != 0) | (credit != 0) | present)
+        amount[use_split] = (credit - debit)[use_split]
+        sign_fixed |= use_split
+
+    # SIGN CORRECTION using Type
+    t_lower = pd.Series(txn_type, dtype=object).str.lower()
+    needs_sign = ~sign_fixed & (amount != 0)
+    to_debit = needs_sign & t_lower.isin(DEBIT_TYPES).to_numpy()
+    to_credit = needs_sign & t_lower.isin(CREDIT_TYPES).to_numpy()
+    amount[to_debit] = -np.abs(amount[to_debit])
+    amount[to_credit] = np.abs(amount[to_credit])
+
+    # 3. DESCRIPTION
+    desc = first_present(plan.descriptions, _text_cell)
+    desc[desc == None] = ""
+
+    # 5. ACCOUNT NAME: Source, else the first account/card number, else a default
+    acc_name = parsed(plan.source, _text_cell)
+    if acc_name is None:
+        acc_name = np.full(n, None, dtype=object)
+    numbers = first_present(plan.accounts, _account_number_cell)
+    missing = acc_name == None
+    acc_name[missing] = numbers[missing]
+    acc_name[acc_name == None] = "Imported CSV"
+
+    return pd.DataFrame({
+        'date': pd.Series(dates[keep], dtype=object),
+        'amount': amount[keep],
+        'description': pd.Series(desc[keep], dtype=object),
+        'raw_description': pd.Series(desc[keep], dtype=object), # Default raw to same as desc for CSVs
+        'type': pd.Series(txn_type[keep], dtype=object),
+        'account_name': pd.Series(acc_name[keep], dtype=object),
+    }).set_axis(df.index[keep])
 
 
 def import_transactions_from_df(db: Session, df: pd.DataFrame, source_label="csv"):
@@ -225,13 +371,14 @@ def import_transactions_from_df(db: Session, df: pd.DataFrame, source_label="csv
     # 1. Load Mappings
     merchant_rules = {m.raw_description: m.standardized_merchant for m in db.query(MerchantMap).all()}
     category_rules = {c.unmapped_description: c.scsc_id for c in db.query(CategoryMap).all()}
-    exclusion_rules = db.query(ExclusionRule).filter(ExclusionRule.is_active == True).all()
+    exclusion_rules = ExclusionMatcher(db.query(ExclusionRule).filter(ExclusionRule.is_active == True).all())
 
     # Create a lower-case map of columns for loose matching
     cols_map = {c.lower().strip(): c for c in df.columns}
+    plan = ColumnPlan.from_cols_map(cols_map)
     
-    # Track fingerprints seen in this specific batch to avoid duplicates within the CSV itself
-    batch_fingerprints = set()
+    # Track fingerprint strings seen in this specific batch to avoid duplicates within the CSV itself
+    batch_keys = set()
 
     stats = {
         'total_rows': len(df),
@@ -243,15 +390,34 @@ def import_transactions_from_df(db: Session, df: pd.DataFrame, source_label="csv
         'error_details': []
     }
 
-    for idx, row in df.iterrows():
+    # A repeated column name has no single cell per row to read
+    if df.columns.has_duplicates:
+        duplicated = sorted(set(df.columns[df.columns.duplicated()]))
+        stats['errors'] += len(df)
+        stats['error_details'].append(f"Duplicate column names: {', '.join(map(str, duplicated))}")
+        return stats
+
+    # Pass 1: Normalize every row
+    norm_df = normalize_bank_df(df, plan)
+    normalized = list(zip(norm_df.index, norm_df.to_dict('records'))) # (idx, norm_data)
+    for idx in df.index.difference(norm_df.index, sort=False):
+        stats['skipped'] += 1
+        stats['skipped_details'].append(f"Row {idx+2}: Could not parse date or required fields.")
+
+    # Fingerprint strings for the whole file in one pass. In-file duplicates are caught
+    # on the strings themselves, so each distinct string is hashed only once.
+    fp_keys = fingerprint_strings(norm_df)
+    fp_by_key = {key: fingerprint_hash(key) for key in set(fp_keys)}
+
+    # Fingerprints already in the DB, fetched in batched IN queries rather than one query per row
+    existing_fingerprints = set(select_in_batches(
+        db, select(Transaction.fingerprint), Transaction.fingerprint, set(fp_by_key.values())
+    ))
+
+    # Pass 2: Apply mappings and dedup; new rows are inserted together afterwards
+    new_rows = []
+    for (idx, norm_data), fp_key in zip(normalized, fp_keys):
         try:
-            norm_data = normalize_bank_row(row, cols_map)
-            
-            if not norm_data:
-                stats['skipped'] += 1
-                stats['skipped_details'].append(f"Row {idx+2}: Could not parse date or required fields.")
-                continue
-            
             # --- Apply Mappings ---
             
             # 1. Merchant Map (Raw Description -> Standardized Merchant)
@@ -268,22 +434,17 @@ def import_transactions_from_df(db: Session, df: pd.DataFrame, source_label="csv
             # Let's try to match the exact raw description first, as that's usually most reliable for rules.
             cat_id = category_rules.get(raw_desc)
             
-            # Generate Fingerprint
-            fp = generate_fingerprint(norm_data['date'], norm_data['amount'], norm_data['description'])
-            
             # Check for matches
             # 1. Check if we already processed this fingerprint in this batch (duplicate in CSV)
-            if fp in batch_fingerprints:
+            if fp_key in batch_keys:
                 stats['skipped'] += 1
                 stats['skipped_details'].append(f"Row {idx+2}: Duplicate within file (Fingerprint clash).")
                 continue
             
-            # Check Exclusion
-            is_excluded = check_exclusion(norm_data['description'], exclusion_rules)
-
-            # 2. Check existing DB fingerprints
-            existing = db.query(Transaction).filter(Transaction.fingerprint == fp).first()
-            if existing:
+            # 2. Check existing DB fingerprints (a set lookup, not a query: fingerprints are
+            # not unique in the table, so this can't be an ON CONFLICT DO NOTHING insert)
+            fp = fp_by_key[fp_key]
+            if fp in existing_fingerprints:
                 # If existing, we could potentially update the exclusion status if rules changed?
                 # For now, let's leave it. If user wants to re-apply rules, they can use the UI tool.
                 stats['skipped'] += 1
@@ -291,25 +452,26 @@ def import_transactions_from_df(db: Session, df: pd.DataFrame, source_label="csv
                 # We typically don't log every existing transaction as "error" but we can track count
                 continue
                 
-            # Create Transaction
-            new_tx = Transaction(
-                fingerprint=fp,
-                date=norm_data['date'],
-                amount=norm_data['amount'],
-                description=norm_data['description'],
-                raw_description=raw_desc,
-                clean_description=norm_data['description'], # Start with raw
-                standardized_merchant=std_merchant,
-                category_id=cat_id,
-                type=norm_data['type'],
-                account_name=norm_data['account_name'],
-                import_method="csv",
-                source_file=source_label,
-                is_excluded=is_excluded
-            )
-            
-            db.add(new_tx)
-            batch_fingerprints.add(fp)
+            # Check Exclusion (only for rows that will actually be inserted)
+            is_excluded = check_exclusion(norm_data['description'], exclusion_rules)
+
+            # Queue the Transaction row (inserted in bulk below)
+            new_rows.append({
+                'fingerprint': fp,
+                'date': norm_data['date'],
+                'amount': norm_data['amount'],
+                'description': norm_data['description'],
+                'raw_description': raw_desc,
+                'clean_description': norm_data['description'], # Start with raw
+                'standardized_merchant': std_merchant,
+                'category_id': cat_id,
+                'type': norm_data['type'],
+                'account_name': norm_data['account_name'],
+                'import_method': "csv",
+                'source_file': source_label,
+                'is_excluded': is_excluded
+            })
+            batch_keys.add(fp_key)
             stats['added'] += 1
             
         except Exception as e:
@@ -318,6 +480,8 @@ def import_transactions_from_df(db: Session, df: pd.DataFrame, source_label="csv
             continue
 
     try:
+        # executemany (multi-row INSERTs) without per-object ORM bookkeeping
+        bulk_insert(db, Transaction, new_rows)
         db.commit()
     except Exception as e:
         stats['error_details'].append(f"Batch Commit Failed: {str(e)}")
@@ -332,8 +496,19 @@ def import_csv_transactions(db: Session, csv_path: str, source_label="csv"):
     and inserts into DB with SimpleFin-compatible fields.
     """
     try:
-        # Read without header assumption first to inspect? No, assume standard header rows.
-        df = pd.read_csv(csv_path)
+        # Header first, so only the columns the normalizer uses are parsed
+        header = pd.read_csv(csv_path, nrows=0).columns
+        plan = ColumnPlan.from_cols_map({c.lower().strip(): c for c in header})
+        text_cols = [*plan.dates, *plan.types, *plan.descriptions, *plan.accounts, *filter(None, [plan.source])]
+        amount_cols = list(filter(None, [plan.amount, plan.debit, plan.credit]))
+        usecols = list(dict.fromkeys(text_cols + amount_cols))
+        if usecols:
+            # Text fields (dates included) are read as str, skipping type inference and keeping
+            # the file's own text (no "1234.0" card numbers or integer-epoch dates);
+            # amount columns keep the C parser's float inference.
+            df = pd.read_csv(csv_path, usecols=usecols, dtype={c: str for c in text_cols})
+        else:
+            df = pd.read_csv(csv_path)
         return import_transactions_from_df(db, df, source_label)
     except Exception as e:
         return {
@@ -354,6 +529,8 @@ def sync_simplefin_data_list(db: Session, transactions_json: list):
     merged = 0
     skipped = 0
     
+    # Parse every item first so existing rows can be looked up in batches
+    parsed = [] # (item, dt, amount, desc, sf_id, fp)
     for item in transactions_json:
         # Map fields from SimpleFin Schema
         # Item keys might differ if via API or CSV. 
@@ -374,44 +551,70 @@ def sync_simplefin_data_list(db: Session, transactions_json: list):
         amount = float(item.get('amount', 0))
         desc = item.get('description', '')
         sf_id = item.get('id')
+        parsed.append((item, dt, amount, desc, sf_id))
+
+    # Fingerprints for the whole list in one vectorized pass
+    # (object dtype keeps a None description as None, which hashes as 'None' like generate_fingerprint)
+    fingerprints = generate_fingerprints(pd.DataFrame([p[1:4] for p in parsed], columns=['date', 'amount', 'description'], dtype=object))
+    parsed = [p + (fp,) for p, fp in zip(parsed, fingerprints)]
+
+    # Existing SimpleFin IDs and fingerprints, two batched IN lookups instead of two queries per item.
+    # Rows added or merged below are registered too, so repeats within the list dedupe against them.
+    known_sf_ids = set(select_in_batches(
+        db, select(Transaction.simplefin_id), Transaction.simplefin_id, {p[4] for p in parsed if p[4]}
+    ))
+    by_fingerprint = {}
+    for tx in select_in_batches(db, select(Transaction).order_by(Transaction.id), Transaction.fingerprint, {p[5] for p in parsed}):
+        by_fingerprint.setdefault(tx.fingerprint, tx)
+
+    new_rows = [] # inserted in bulk after the loop
+    for item, dt, amount, desc, sf_id, fp in parsed:
         account = item.get('source') or item.get('org', {}).get('name')
         
         # 1. Idempotency by SimpleFin ID
-        if sf_id:
-            existing_sf = db.query(Transaction).filter(Transaction.simplefin_id == sf_id).first()
-            if existing_sf:
-                skipped += 1
-                continue
+        if sf_id and sf_id in known_sf_ids:
+            skipped += 1
+            continue
                 
         # 2. Merge check (Fingerprint)
-        fp = generate_fingerprint(dt, amount, desc)
-        existing_fp = db.query(Transaction).filter(Transaction.fingerprint == fp).first()
+        existing_fp = by_fingerprint.get(fp)
         
-        if existing_fp:
+        if existing_fp is not None:
             # Upgrade existing CSV row to Connected row
-            if sf_id: existing_fp.simplefin_id = sf_id
-            existing_fp.account_name = account # Update account name to official one
-            existing_fp.import_method = "simplefin_merge"
-            existing_fp.source_file = "SimpleFin" # Update source per user request
+            changes = {
+                'account_name': account, # Update account name to official one
+                'import_method': "simplefin_merge",
+                'source_file': "SimpleFin" # Update source per user request
+            }
+            if sf_id: changes['simplefin_id'] = sf_id
             if item.get('pending') is False:
                  pass # Could update status
+            if isinstance(existing_fp, dict):
+                existing_fp.update(changes) # Row queued earlier in this list
+            else:
+                for key, value in changes.items():
+                    setattr(existing_fp, key, value)
             merged += 1
+            if sf_id: known_sf_ids.add(sf_id)
         else:
-            new_tx = Transaction(
-                simplefin_id=sf_id,
-                fingerprint=fp,
-                date=dt,
-                amount=amount,
-                description=desc,
-                raw_description=desc,
-                clean_description=desc,
-                account_name=account,
-                import_method="simplefin_api",
-                source_file="SimpleFin",
-                type=item.get('type', '')
-            )
-            db.add(new_tx)
+            new_row = {
+                'simplefin_id': sf_id,
+                'fingerprint': fp,
+                'date': dt,
+                'amount': amount,
+                'description': desc,
+                'raw_description': desc,
+                'clean_description': desc,
+                'account_name': account,
+                'import_method': "simplefin_api",
+                'source_file': "SimpleFin",
+                'type': item.get('type', '')
+            }
+            new_rows.append(new_row)
             added += 1
+            by_fingerprint[fp] = new_row
+            if sf_id: known_sf_ids.add(sf_id)
             
+    bulk_insert(db, Transaction, new_rows)
     db.commit()
     return added, merged, skipped
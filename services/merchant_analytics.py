@@ -1,8 +1,30 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, or_
-from database.models import Transaction, Category
+from sqlalchemy import func, desc, or_, select, union_all
+from database.models import Transaction, Category, TxRollupMonth
 from datetime import date
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+
+def _whole_months(start_date: date, end_date: date) -> Optional[Tuple[str, str]]:
+    """
+    ('YYYY-MM', 'YYYY-MM') bounds [first, stop) of the calendar months lying entirely
+    inside the query range, which can be read from tx_rollup_month; None if there are none.
+    """
+    first = (start_date.year, start_date.month)
+    if start_date.day != 1:
+        first = (first[0] + first[1] // 12, first[1] % 12 + 1)
+    # A month is whole only if the next one starts on/before end_date
+    stop = (end_date.year, end_date.month)
+    if first >= stop:
+        return None
+    return f"{first[0]:04d}-{first[1]:02d}", f"{stop[0]:04d}-{stop[1]:02d}"
+
+def _category_col(entity_type: str):
+    """Category column an entity type groups/filters by; None for merchants."""
+    return {
+        'Category': Category.category,
+        'Subcategory': Category.subcategory,
+        'Section': Category.section,
+    }.get(entity_type)
 
 def get_top_entities(
     db: Session,
@@ -14,6 +36,8 @@ def get_top_entities(
 ) -> List[Dict]:
     """
     Get top entities (Merchants, Categories, Sections) by spending volume.
+    Whole months are summed from tx_rollup_month; only the partial months at
+    either end of the range are aggregated from transactions.
     """
     # Determine grouping entity
     if group_by == 'Category':
@@ -28,46 +52,77 @@ def get_top_entities(
     else: # Merchant
         group_col = Transaction.standardized_merchant
         label_key = 'standardized_merchant'
+    join_category = group_by in ('Category', 'Subcategory', 'Section')
+    months = _whole_months(start_date, end_date)
 
-    query = db.query(
+    raw = select(
         group_col.label('entity_name'),
         func.sum(Transaction.amount).label('total_amount'),
-        func.count(Transaction.id).label('transaction_count'),
-        func.avg(Transaction.amount).label('avg_transaction')
-    ).join(
-        Category,
-        Transaction.category_id == Category.id, 
-        isouter=True
-    ).filter(
+        func.count(Transaction.id).label('transaction_count')
+    )
+    if join_category:
+        # Merchant grouping reads only transactions (covered by ix_tx_date_merchant_cover)
+        raw = raw.join(
+            Category,
+            Transaction.category_id == Category.id, 
+            isouter=True
+        )
+    raw = raw.where(
         Transaction.date >= start_date,
         Transaction.date <= end_date,
         Transaction.is_excluded == False
     )
+    parts = [raw]
+    if months:
+        tx_month = func.substr(Transaction.date, 1, 7)
+        parts[0] = raw.where(or_(tx_month < months[0], tx_month >= months[1]))
+        rollup_col = _category_col(group_by) if join_category else func.nullif(TxRollupMonth.merchant, '')
+        rollup = select(
+            rollup_col.label('entity_name'),
+            func.sum(TxRollupMonth.net_amount).label('total_amount'),
+            func.sum(TxRollupMonth.tx_count).label('transaction_count')
+        )
+        if join_category:
+            rollup = rollup.join(Category, TxRollupMonth.category_id == Category.id, isouter=True)
+        rollup = rollup.where(
+            TxRollupMonth.month >= months[0],
+            TxRollupMonth.month < months[1],
+            TxRollupMonth.is_excluded == False
+        )
+        parts.append(rollup.group_by(rollup_col))
+    parts[0] = parts[0].group_by(group_col)
     
     # Handle NULLs (e.g. unmapped merchants or categories)
-    # We filter them out or include them appropriately
-    
-    query = query.group_by(group_col).having(func.sum(Transaction.amount) < 0)
+    # They group together as a single "Unspecified" entity
+    combined = union_all(*parts).subquery()
+    total = func.sum(combined.c.total_amount)
+    count = func.sum(combined.c.transaction_count)
+    query = select(
+        combined.c.entity_name,
+        total.label('total_amount'),
+        count.label('transaction_count'),
+        (total / count).label('avg_transaction')
+    ).group_by(combined.c.entity_name).having(total < 0)
     
     if sort_by == 'count':
         query = query.order_by(desc('transaction_count'))
     else:
         # Sort by magnitude of spending (most negative first)
-        query = query.order_by(func.sum(Transaction.amount).asc())
+        query = query.order_by(total.asc())
     
-    results = query.limit(limit).all()
+    results = db.execute(query.limit(limit)).mappings()
     
     data = []
     for r in results:
-        name = r.entity_name or f"Unspecified {group_by}"
-        # Convert net negative amount to positive for display (Spending)
-        net_spend = abs(float(r.total_amount or 0)) 
+        name = r['entity_name'] or f"Unspecified {group_by}"
+        # Net amount is negative (HAVING above), so negate it for display (Spending)
+        net_spend = -float(r['total_amount'] or 0)
         data.append({
             'standardized_merchant': name, # Keep key for grid compatibility, or rename grid col
             'entity_type': group_by,
             'total_amount': net_spend,
-            'transaction_count': int(r.transaction_count or 0),
-            'avg_transaction': abs(float(r.avg_transaction or 0))
+            'transaction_count': int(r['transaction_count'] or 0),
+            'avg_transaction': -float(r['avg_transaction'] or 0)
         })
     return data
 
@@ -81,6 +136,7 @@ def get_entity_time_series(
 ) -> List[Dict]:
     """
     Get spending trend for a specific entity.
+    Monthly/yearly buckets read whole months from tx_rollup_month.
     """
     if group_by == 'day':
         group_expr = func.date(Transaction.date)
@@ -88,8 +144,9 @@ def get_entity_time_series(
         group_expr = func.strftime('%Y', Transaction.date)
     else: # month
         group_expr = func.strftime('%Y-%m', Transaction.date)
+    months = _whole_months(start_date, end_date) if group_by != 'day' else None
 
-    query = db.query(
+    raw = select(
         group_expr.label('period'),
         func.sum(func.abs(Transaction.amount)).label('total_amount'),
         func.count(Transaction.id).label('count')
@@ -97,7 +154,7 @@ def get_entity_time_series(
         Category,
         Transaction.category_id == Category.id, 
         isouter=True
-    ).filter(
+    ).where(
         Transaction.date >= start_date,
         Transaction.date <= end_date,
         Transaction.is_excluded == False,
@@ -105,20 +162,47 @@ def get_entity_time_series(
     )
     
     # Filter by Entity
-    if entity_type == 'Category':
-        query = query.filter(Category.category == entity_name)
-    elif entity_type == 'Subcategory':
-        query = query.filter(Category.subcategory == entity_name)
-    elif entity_type == 'Section':
-        query = query.filter(Category.section == entity_name)
+    if entity_type in ('Category', 'Subcategory', 'Section'):
+        raw = raw.where(_category_col(entity_type) == entity_name)
     else:
-        query = query.filter(Transaction.standardized_merchant == entity_name)
-        
-    query = query.group_by(group_expr).order_by(group_expr)
+        raw = raw.where(Transaction.standardized_merchant == entity_name)
+    if not months:
+        query = raw.group_by(group_expr).order_by(group_expr)
+        return [
+            {'date': r['period'], 'amount': float(r['total_amount']), 'count': int(r['count'])}
+            for r in db.execute(query).mappings()
+        ]
+
+    tx_month = func.substr(Transaction.date, 1, 7)
+    raw = raw.where(or_(tx_month < months[0], tx_month >= months[1])).group_by(group_expr)
+    rollup_period = TxRollupMonth.month if group_by == 'month' else func.substr(TxRollupMonth.month, 1, 4)
+    rollup = select(
+        rollup_period.label('period'),
+        (-func.sum(TxRollupMonth.spend_amount)).label('total_amount'),
+        func.sum(TxRollupMonth.spend_count).label('count')
+    ).where(
+        TxRollupMonth.month >= months[0],
+        TxRollupMonth.month < months[1],
+        TxRollupMonth.is_excluded == False,
+        TxRollupMonth.spend_count > 0
+    )
+    if entity_type in ('Category', 'Subcategory', 'Section'):
+        rollup = rollup.join(Category, TxRollupMonth.category_id == Category.id)\
+                       .where(_category_col(entity_type) == entity_name)
+    else:
+        rollup = rollup.where(TxRollupMonth.merchant == entity_name)
+    rollup = rollup.group_by(rollup_period)
+
+    combined = union_all(raw, rollup).subquery()
+    query = select(
+        combined.c.period,
+        func.sum(combined.c.total_amount).label('total_amount'),
+        func.sum(combined.c.count).label('count')
+    ).group_by(combined.c.period).order_by(combined.c.period)
     
     return [
-        {'date': r[0], 'amount': float(r[1]), 'count': int(r[2])}
-        for r in query.all()
+        {'date': r['period'], 'amount': float(r['total_amount']), 'count': int(r['count'])}
+        for r in db.execute(query).mappings()
     ]
 
 def get_entity_transactions(
@@ -131,31 +215,29 @@ def get_entity_transactions(
 ) -> List[Dict]:
     """
     Get raw transactions for drill-down.
+    Selects just the displayed columns (no ORM objects to build).
     """
-    query = db.query(Transaction).join(
-        Category,
-        Transaction.category_id == Category.id, 
-        isouter=True
-    ).filter(
+    query = select(
+        Transaction.id,
+        Transaction.date,
+        Transaction.raw_description,
+        Transaction.description,
+        Transaction.amount,
+        Transaction.source_file,
+        Transaction.account_name
+    ).where(
         Transaction.date >= start_date,
         Transaction.date <= end_date,
         Transaction.is_excluded == False
     )
 
-    if entity_type == 'Category':
-        query = query.filter(Category.category == entity_name)
-    elif entity_type == 'Subcategory':
-        query = query.filter(Category.subcategory == entity_name)
-    elif entity_type == 'Section':
-        query = query.filter(Category.section == entity_name)
+    if entity_type in ('Category', 'Subcategory', 'Section'):
+        # The category filter rules out NULL categories, so an inner join is enough
+        query = query.join(Category, Transaction.category_id == Category.id)\
+                     .where(_category_col(entity_type) == entity_name)
     else:
-        # For merchant, include raw name variations if possible
-        query = query.filter(
-             or_(
-                Transaction.standardized_merchant == entity_name,
-                Transaction.clean_description == entity_name
-            )
-        )
+        # Same key get_top_entities groups merchants by
+        query = query.where(Transaction.standardized_merchant == entity_name)
         
     query = query.order_by(Transaction.date.desc())
     
@@ -164,11 +246,12 @@ def get_entity_transactions(
     
     return [
         {
-            'id': t.id,
-            'date': t.date.strftime('%Y-%m-%d'),
-            'raw_description': t.raw_description or t.description,
-            'amount': t.amount,
-            'source': t.source_file or t.account_name
+            'id': t['id'],
+            'date': t['date'].strftime('%Y-%m-%d'),
+            'raw_description': t['raw_description'] or t['description'],
+            'amount': t['amount'],
+            'source': t['source_file'] or t['account_name']
         }
-        for t in query.all()
+        # Rows are fetched in batches rather than buffered all at once (limit may be None)
+        for t in db.execute(query.execution_options(yield_per=500)).mappings()
     ]
@@ -8,12 +8,53 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from database.connection import SessionLocal, engine, Base
 from database.models import Category, MerchantMap, CategoryMap, Budget, ExclusionRule
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import datetime
+
+# Rows per pandas chunk when reading seed files, so memory is bounded by one chunk
+SEED_CHUNK_SIZE = 50_000
+
+def read_csv_chunks(csv_path, text_cols, other_cols=()):
+    """
+    Read a seed CSV in SEED_CHUNK_SIZE chunks, loading only the listed columns
+    that are present. text_cols are read as str, so every chunk parses them the same way.
+    """
+    wanted = set(text_cols) | set(other_cols)
+    return pd.read_csv(csv_path, chunksize=SEED_CHUNK_SIZE, usecols=lambda c: c in wanted,
+                       dtype={c: str for c in text_cols})
 
 def clean_val(val):
     if pd.isna(val) or val == 'nan' or val == '':
         return None
     return str(val).strip()
 
+def clean_col(df, col):
+    """clean_val over a whole column, as a list."""
+    return [clean_val(v) for v in df[col].tolist()]
+
+def parse_amount(amt_raw):
+    """Budget amount with '$' and ',' stripped; 0.0 if it doesn't parse."""
+    try:
+        if isinstance(amt_raw, str):
+            amt_raw = amt_raw.replace('$', '').replace(',', '')
+        return float(amt_raw)
+    except:
+        return 0.0
+
+def upsert_rows(session, model, key_col, update_cols, rows):
+    """
+    Insert `rows` (dicts) into model's table in one executemany, updating
+    `update_cols` (plus updated_at, if the model has it) where key_col already
+    exists. A key repeated in the file ends up with its last row's values.
+    """
+    if not rows:
+        return
+    stmt = sqlite_insert(model)
+    set_ = {c: stmt.excluded[c] for c in update_cols}
+    if 'updated_at' in model.__table__.c:
+        set_['updated_at'] = stmt.excluded.updated_at
+    session.execute(stmt.on_conflict_do_update(index_elements=[key_col], set_=set_), rows)
+
 def seed_exclusions(session, root_dir):
     # Support exclude.csv and exclude.txt
     files = ['exclude.csv', 'exclude.txt']
@@ -28,10 +69,11 @@ def seed_exclusions(session, root_dir):
             # Check if CSV or simple text
             if fname.endswith('.csv'):
                 try:
-                    df = pd.read_csv(fpath, header=None)
                     # Assume single column or handle potential variations
                     # If multiple columns, we look for first string col
-                    values = df.iloc[:,0].dropna().astype(str).tolist()
+                    values = []
+                    for df in pd.read_csv(fpath, header=None, usecols=[0], dtype=str, chunksize=SEED_CHUNK_SIZE):
+                        values.extend(df.iloc[:,0].dropna().tolist())
                 except:
                     # Fallback to text read if CSV parse fails
                     with open(fpath, 'r') as f:
@@ -40,6 +82,8 @@ def seed_exclusions(session, root_dir):
                  with open(fpath, 'r') as f:
                         values = [line.strip() for line in f if line.strip()]
             
+            # Existing rule values loaded once instead of one query per value
+            existing_values = {v for (v,) in session.query(ExclusionRule.value)}
             count = 0
             for val in values:
                 # Basic cleanup
@@ -47,8 +91,8 @@ def seed_exclusions(session, root_dir):
                 if not val: continue
                 
                 # Check for duplicate in DB
-                existing = session.query(ExclusionRule).filter(ExclusionRule.value == val).first()
-                if not existing:
+                if val not in existing_values:
+                    existing_values.add(val)
                     # Determine regex vs exact match heuristically?
                     # Prompt says: "treat them as `rule_type='exact_match'` (or `regex` if they look like patterns)."
                     # Simple heuristic: if contains regex chars like ^, $, *, etc., assume regex.
@@ -77,36 +121,26 @@ def seed():
         # Seeding Exclusions First
         seed_exclusions(session, root_dir)
 
+        # Each table: read in chunks, each chunk's columns cleaned as a whole, then
+        # one upsert statement per chunk (insert new keys, update existing ones)
+        # instead of a query per row. One commit per table.
+
         # 1. Categories
         csv_path = os.path.join(root_dir, "Sections_category_subcategory.csv")
         if os.path.exists(csv_path):
             print(f"Seeding Categories from {csv_path}...")
-            df = pd.read_csv(csv_path)
             # Expected cols: ID, Section, Category, Subcategory
-            
             count = 0
-            for _, row in df.iterrows():
-                cid = clean_val(row['ID'])
-                if not cid: continue
-                
-                section = clean_val(row['Section'])
-                category = clean_val(row['Category'])
-                subcategory = clean_val(row.get('Subcategory'))
-
-                existing = session.query(Category).filter_by(id=cid).first()
-                if not existing:
-                    cat = Category(
-                        id=cid,
-                        section=section or "Unknown",
-                        category=category or "Unknown",
-                        subcategory=subcategory
-                    )
-                    session.add(cat)
-                else:
-                    existing.section = section or "Unknown"
-                    existing.category = category or "Unknown"
-                    existing.subcategory = subcategory
-                count += 1
+            for df in read_csv_chunks(csv_path, ['ID', 'Section', 'Category', 'Subcategory']):
+                rows = [
+                    {'id': cid, 'section': section or "Unknown", 'category': category or "Unknown", 'subcategory': subcategory}
+                    for cid, section, category, subcategory in zip(
+                        clean_col(df, 'ID'), clean_col(df, 'Section'), clean_col(df, 'Category'),
+                        clean_col(df, 'Subcategory') if 'Subcategory' in df.columns else [None] * len(df))
+                    if cid
+                ]
+                upsert_rows(session, Category, Category.id, ['section', 'category', 'subcategory'], rows)
+                count += len(rows)
             session.commit()
             print(f"Processed {count} categories.")
         else:
@@ -116,23 +150,17 @@ def seed():
         csv_path = os.path.join(root_dir, "merchant_map.csv")
         if os.path.exists(csv_path):
             print(f"Seeding Merchant Maps from {csv_path}...")
-            df = pd.read_csv(csv_path)
             # Cols: Raw_Description, Standardized_Merchant
-            
+            now = datetime.utcnow()
             count = 0
-            for _, row in df.iterrows():
-                raw = clean_val(row['Raw_Description'])
-                std = clean_val(row['Standardized_Merchant'])
-                
-                if not raw or not std: continue
-
-                existing = session.query(MerchantMap).filter_by(raw_description=raw).first()
-                if not existing:
-                    m = MerchantMap(raw_description=raw, standardized_merchant=std)
-                    session.add(m)
-                else:
-                    existing.standardized_merchant = std
-                count += 1
+            for df in read_csv_chunks(csv_path, ['Raw_Description', 'Standardized_Merchant']):
+                rows = [
+                    {'raw_description': raw, 'standardized_merchant': std, 'created_at': now, 'updated_at': now}
+                    for raw, std in zip(clean_col(df, 'Raw_Description'), clean_col(df, 'Standardized_Merchant'))
+                    if raw and std
+                ]
+                upsert_rows(session, MerchantMap, MerchantMap.raw_description, ['standardized_merchant'], rows)
+                count += len(rows)
             session.commit()
             print(f"Processed {count} merchant maps.")
         else:
@@ -142,23 +170,17 @@ def seed():
         csv_path = os.path.join(root_dir, "ChatGPT_normalization_map_ID.csv")
         if os.path.exists(csv_path):
             print(f"Seeding Category Maps from {csv_path}...")
-            df = pd.read_csv(csv_path)
             # Cols: Unmapped_Description, SCSC_ID
-            
+            now = datetime.utcnow()
             count = 0
-            for _, row in df.iterrows():
-                desc = clean_val(row['Unmapped_Description'])
-                scsc = clean_val(row['SCSC_ID'])
-                
-                if not desc or not scsc: continue
-
-                existing = session.query(CategoryMap).filter_by(unmapped_description=desc).first()
-                if not existing:
-                    cm = CategoryMap(unmapped_description=desc, scsc_id=scsc)
-                    session.add(cm)
-                else:
-                    existing.scsc_id = scsc
-                count += 1
+            for df in read_csv_chunks(csv_path, ['Unmapped_Description', 'SCSC_ID']):
+                rows = [
+                    {'unmapped_description': desc, 'scsc_id': scsc, 'created_at': now, 'updated_at': now}
+                    for desc, scsc in zip(clean_col(df, 'Unmapped_Description'), clean_col(df, 'SCSC_ID'))
+                    if desc and scsc
+                ]
+                upsert_rows(session, CategoryMap, CategoryMap.unmapped_description, ['scsc_id'], rows)
+                count += len(rows)
             session.commit()
             print(f"Processed {count} category maps.")
         else:
@@ -168,30 +190,18 @@ def seed():
         csv_path = os.path.join(root_dir, "budget.csv")
         if os.path.exists(csv_path):
             print(f"Seeding Budget from {csv_path}...")
-            df = pd.read_csv(csv_path)
             # Cols: SCSC_ID, Amount
-            
+            now = datetime.utcnow()
             count = 0
-            for _, row in df.iterrows():
-                scsc = clean_val(row['SCSC_ID'])
+            for df in read_csv_chunks(csv_path, ['SCSC_ID'], ['Amount']):
                 # Handle amount carefully, clear '$' or ','
-                amt_raw = row['Amount']
-                try:
-                    if isinstance(amt_raw, str):
-                        amt_raw = amt_raw.replace('$', '').replace(',', '')
-                    amt = float(amt_raw)
-                except:
-                    amt = 0.0
-
-                if not scsc: continue
-                
-                existing = session.query(Budget).filter_by(scsc_id=scsc).first()
-                if not existing:
-                    b = Budget(scsc_id=scsc, amount=amt)
-                    session.add(b)
-                else:
-                    existing.amount = amt
-                count += 1
+                rows = [
+                    {'scsc_id': scsc, 'amount': parse_amount(amt_raw), 'created_at': now, 'updated_at': now}
+                    for scsc, amt_raw in zip(clean_col(df, 'SCSC_ID'), df['Amount'].tolist())
+                    if scsc
+                ]
+                upsert_rows(session, Budget, Budget.scsc_id, ['amount'], rows)
+                count += len(rows)
             session.commit()
             print(f"Processed {count} budget items.")
         else:
@@ -1,5 +1,5 @@
 from services.simplefin import SimpleFin
-from database.connection import SessionLocal
+from database.connection import SessionLocal, bulk_insert, select_in_batches
 from database.models import Transaction, StagedTransaction, AppSettings
 from datetime import datetime, timedelta
 from sqlalchemy import select
@@ -35,18 +35,17 @@ def sync_simplefin_to_staging(access_url: str, lookback_days: int = 30) -> dict:
 
     # 3. Process
     with SessionLocal() as db:
-        # Pre-load existing external_ids to minimize DB hits
-        # Get all external_ids from Transaction where simplefin_id is not null
-        # And all from StagedTransaction
-        
+        # Pre-load which of this batch's external_ids already exist, via the
+        # unique indexes on Transaction.simplefin_id and StagedTransaction.external_id
+        batch_ids = {f"{tx['account_id']}-{tx['id']}" for tx in transactions}
         existing_tx_ids = set(
-            db.scalars(select(Transaction.simplefin_id).where(Transaction.simplefin_id != None)).all()
+            select_in_batches(db, select(Transaction.simplefin_id), Transaction.simplefin_id, batch_ids)
         )
         existing_staged_ids = set(
-            db.scalars(select(StagedTransaction.external_id)).all()
+            select_in_batches(db, select(StagedTransaction.external_id), StagedTransaction.external_id, batch_ids)
         )
         
-        new_staged = []
+        staged_rows = []
         
         for tx in transactions:
             # 4. Check Date Cutoff again (just in case API returned extra)
@@ -83,20 +82,20 @@ def sync_simplefin_to_staging(access_url: str, lookback_days: int = 30) -> dict:
             desc = tx.get('description', '')
             if not desc: desc = tx.get('payee', 'Unknown')
             
-            staged = StagedTransaction(
-                external_id=ext_id,
-                date=tx_date,
-                description=desc,
-                amount=amt,
-                account_name=acct_name,
-                status='pending'
-            )
-            
-            db.add(staged)
+            staged_rows.append({
+                'external_id': ext_id,
+                'date': tx_date,
+                'description': desc,
+                'amount': amt,
+                'account_name': acct_name,
+                'status': 'pending'
+            })
             stats["staged"] += 1
             existing_staged_ids.add(ext_id) # Add to set to prevent dups within same batch
             
         try:
+            # One executemany INSERT instead of an ORM object per row
+            bulk_insert(db, StagedTransaction, staged_rows)
             db.commit()
         except Exception as e:
             db.rollback()
@@ -0,0 +1,48 @@
+import unittest
+from datetime import datetime
+
+import pandas as pd
+
+from database.models import Transaction, format_amount, to_cents, fingerprint_hash
+from services.importer import generate_fingerprint, fingerprint_strings
+
+# Half-cent amounts, where round(amount * 100) and '%.2f' disagree
+HALF_CENT_AMOUNTS = [2.675, -0.005, 10.235, 0.015, -2.675, 1.005, -0.001, 0.0, 1234.5]
+
+
+class FormatAmountTest(unittest.TestCase):
+    def test_matches_historical_format(self):
+        for amount in HALF_CENT_AMOUNTS:
+            self.assertEqual(format_amount(amount), f"{amount:.2f}")
+        self.assertEqual(format_amount(2.675), "2.67")
+        self.assertEqual(format_amount(-0.005), "-0.01")
+
+    def test_cents_follow_format(self):
+        self.assertEqual(to_cents(2.675), 267)
+        self.assertEqual(to_cents(-0.005), -1)
+        self.assertEqual(to_cents(10.235), 1023)
+        self.assertEqual(to_cents(-1234.5), -123450)
+
+
+class FingerprintTest(unittest.TestCase):
+    def test_scalar_fingerprint_uses_historical_amount(self):
+        date = datetime(2024, 3, 5)
+        for amount in HALF_CENT_AMOUNTS:
+            expected = fingerprint_hash(f"2024-03-05|{amount:.2f}|COFFEE SHOP")
+            self.assertEqual(generate_fingerprint(date, amount, "  COFFEE   SHOP "), expected)
+            self.assertEqual(Transaction.generate_fingerprint("2024-03-05", amount, "COFFEE SHOP "), expected)
+
+    def test_vectorized_matches_scalar(self):
+        df = pd.DataFrame({
+            'date': [datetime(2024, 3, 5)] * len(HALF_CENT_AMOUNTS),
+            'amount': HALF_CENT_AMOUNTS,
+            'description': ["COFFEE  SHOP"] * len(HALF_CENT_AMOUNTS),
+        })
+        self.assertEqual(
+            [fingerprint_hash(s) for s in fingerprint_strings(df)],
+            [generate_fingerprint(d, a, desc) for d, a, desc in zip(df['date'], df['amount'], df['description'])],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import hashlib
+import unittest
+
+from sqlalchemy import create_engine, text
+
+from database.models import fingerprint_hash
+from migration import rehash_legacy_fingerprints, strip_float_account_numbers
+
+
+def legacy_fingerprint(raw: str) -> str:
+    """SHA-256 fingerprint as the code before xxh128 stored it."""
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class RehashLegacyFingerprintsTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE transactions (id INTEGER PRIMARY KEY, date DATETIME, amount FLOAT, description TEXT, fingerprint TEXT)"
+            ))
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def seed(self, conn, tx_id, amount, fingerprint):
+        conn.execute(text(
+            "INSERT INTO transactions (id, date, amount, description, fingerprint) "
+            "VALUES (:id, '2024-03-05 00:00:00.000000', :amount, 'COFFEE  SHOP', :fp)"
+        ), {'id': tx_id, 'amount': amount, 'fp': fingerprint})
+
+    def fingerprint_of(self, conn, tx_id):
+        return conn.execute(text("SELECT fingerprint FROM transactions WHERE id = :id"), {'id': tx_id}).scalar()
+
+    def test_half_cent_amounts_are_rehashed(self):
+        with self.engine.begin() as conn:
+            for tx_id, amount in enumerate([2.675, -0.005, 10.235, -4.5], start=1):
+                # Baseline input: '%.2f' amount, whitespace-collapsed description
+                self.seed(conn, tx_id, amount, legacy_fingerprint(f"2024-03-05|{amount:.2f}|COFFEE SHOP"))
+            rehash_legacy_fingerprints(conn)
+
+            self.assertEqual(self.fingerprint_of(conn, 1), fingerprint_hash("2024-03-05|2.67|COFFEE SHOP"))
+            self.assertEqual(self.fingerprint_of(conn, 2), fingerprint_hash("2024-03-05|-0.01|COFFEE SHOP"))
+            self.assertEqual(self.fingerprint_of(conn, 3), fingerprint_hash("2024-03-05|10.23|COFFEE SHOP"))
+            self.assertEqual(self.fingerprint_of(conn, 4), fingerprint_hash("2024-03-05|-4.50|COFFEE SHOP"))
+
+    def test_unmatched_rows_keep_their_fingerprint(self):
+        stale = legacy_fingerprint("2024-03-05|9.99|COFFEE SHOP")
+        with self.engine.begin() as conn:
+            self.seed(conn, 1, 2.675, stale)
+            rehash_legacy_fingerprints(conn)
+            self.assertEqual(self.fingerprint_of(conn, 1), stale)
+
+
+class StripFloatAccountNumbersTest(unittest.TestCase):
+    def test_float_card_numbers_are_renamed(self):
+        engine = create_engine("sqlite://")
+        names = ["Account 1234.0", "Account 1234", "Account 12.5", "Account 12a4.0", "Chase - Checking", "Account .0", None]
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE transactions (id INTEGER PRIMARY KEY, account_name TEXT)"))
+            conn.execute(text("INSERT INTO transactions (account_name) VALUES (:name)"), [{'name': n} for n in names])
+            strip_float_account_numbers(conn)
+            renamed = conn.execute(text("SELECT account_name FROM transactions ORDER BY id")).scalars().all()
+        engine.dispose()
+        self.assertEqual(renamed, ["Account 1234", "Account 1234", "Account 12.5", "Account 12a4.0", "Chase - Checking", "Account .0", None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,23 @@
 from nicegui import ui
 from ui.state import filter_sidebar
 
+# Header navigation: (label, target, icon, tabs that highlight the link)
+NAV_ITEMS = (
+    ('Dashboard', '/', 'dashboard', ('dashboard',)),
+    ('Analytics', '/intelligence', 'insights', ('intelligence',)),
+    ('Transactions', '/transactions', 'receipt_long', ('transactions',)),
+    ('Budget', '/budget', 'account_balance_wallet', ('budget',)),
+    ('Spending', '/spending', 'pie_chart', ('spending',)),
+    ('Import', '/import', 'upload_file', ('import',)),
+    ('Bank Sync', '/sync', 'sync_alt', ('sync',)),
+    ('Mappings', '/mappings', 'map', ('mappings',)),
+    ('Exclusions', '/excluded', 'visibility_off', ('excluded', 'batch_exclude')),
+)
+
+# (icon classes, label classes) for the active and inactive nav links
+NAV_ACTIVE_CLS = ('text-blue-400', 'text-blue-400 font-medium')
+NAV_INACTIVE_CLS = ('text-gray-300 hover:text-white', 'text-gray-300 hover:text-white font-medium')
+
 def frame(active_tab: str, content_func):
     """
     Standard App Shell with Navigation.
@@ -16,23 +33,13 @@ def frame(active_tab: str, content_func):
         ui.space()
         
         # Navigation Links
-        def nav_link(label, target, icon_name, is_active):
-            color = 'text-blue-400' if is_active else 'text-gray-300 hover:text-white'
-            with ui.link(target=target).classes('no-underline'):
-                with ui.row().classes('items-center gap-1'):
-                    ui.icon(icon_name).classes(f'{color}')
-                    ui.label(label).classes(f'{color} font-medium')
-        
         with ui.row().classes('gap-6 items-center'):
-            nav_link('Dashboard', '/', 'dashboard', active_tab == 'dashboard')
-            nav_link('Analytics', '/intelligence', 'insights', active_tab == 'intelligence')
-            nav_link('Transactions', '/transactions', 'receipt_long', active_tab == 'transactions')
-            nav_link('Budget', '/budget', 'account_balance_wallet', active_tab == 'budget')
-            nav_link('Spending', '/spending', 'pie_chart', active_tab == 'spending')
-            nav_link('Import', '/import', 'upload_file', active_tab == 'import')
-            nav_link('Bank Sync', '/sync', 'sync_alt', active_tab == 'sync')
-            nav_link('Mappings', '/mappings', 'map', active_tab == 'mappings')
-            nav_link('Exclusions', '/excluded', 'visibility_off', active_tab in ['excluded', 'batch_exclude'])
+            for label, target, icon_name, tabs in NAV_ITEMS:
+                icon_cls, label_cls = NAV_ACTIVE_CLS if active_tab in tabs else NAV_INACTIVE_CLS
+                with ui.link(target=target).classes('no-underline'):
+                    with ui.row().classes('items-center gap-1'):
+                        ui.icon(icon_name).classes(icon_cls)
+                        ui.label(label).classes(label_cls)
             
             # Dark Mode Toggle (Beta)
             dm = ui.dark_mode()
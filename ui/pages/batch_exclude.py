@@ -104,6 +104,8 @@ def content():
             has_value_col = 'value' in df.columns
             
             seen_in_batch = set()
+            # Existing rule ids by value, loaded once instead of one query per row
+            existing_ids = dict(db.query(ExclusionRule.value, ExclusionRule.id).all())
 
             for _, row in df.iterrows():
                 # Extract Data
@@ -136,12 +138,12 @@ def content():
                     continue
 
                 # Check for Duplicates in DB
-                exists = db.query(ExclusionRule).filter(ExclusionRule.value == val).first()
+                existing_id = existing_ids.get(val)
                 
                 status_msg = "Skipped"
                 result_type = "skipped" # for logic/coloring
                 
-                if not exists:
+                if existing_id is None:
                     # Validate rule_type
                     if rtype not in ['exact_match', 'regex', 'contains']:
                         rtype = 'contains' 
@@ -152,7 +154,7 @@ def content():
                     status_msg = "Imported"
                     result_type = "imported"
                 else:
-                    status_msg = f"Skipped (Exists: ID {exists.id})"
+                    status_msg = f"Skipped (Exists: ID {existing_id})"
                 
                 records.append({
                     'value': val,
@@ -61,11 +61,11 @@ def budget_planning_page():
         n = ui.notify("Saving budgets...", type='ongoing')
         try:
             with SessionLocal() as db:
-                # Save Budgets
-                for scsc_id in s.modified_ids:
-                    amt = s.budgets.get(scsc_id, 0.0)
-                    note = s.notes.get(scsc_id, "")
-                    BudgetService.update_budget(scsc_id, amt, note, db=db)
+                # Save Budgets (validated and upserted together)
+                BudgetService.update_budgets(
+                    {scsc_id: (s.budgets.get(scsc_id, 0.0), s.notes.get(scsc_id, "")) for scsc_id in s.modified_ids},
+                    db=db
+                )
                 
                 # Save Income if changed
                 if s.income_modified:
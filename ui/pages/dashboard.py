@@ -1,6 +1,6 @@
 from nicegui import ui
 from database.connection import get_db
-from services.analytics import get_net_income_range, get_category_breakdown, get_budget_progress, get_monthly_transactions
+from services.analytics import get_net_income_range, get_dashboard_bundle, get_monthly_transactions
 from datetime import date, datetime
 import plotly.graph_objects as go
 from ui.state import app_state
@@ -40,7 +40,7 @@ def content():
                 grid_data.append({
                     'date': t.date.strftime('%Y-%m-%d'),
                     'description': t.description,
-                    'category': t.category.category if t.category else 'Uncategorized',
+                    'category': t.category or 'Uncategorized',
                     'amount': t.amount
                 })
                 total_amt += t.amount
@@ -170,6 +170,9 @@ def content():
                      ui.label('No data available for the selected range.').classes('text-gray-400 italic')
 
             # --- 2. Focus Month Breakdown ---
+            # Budget progress and category breakdown come from one query
+            bundle = get_dashboard_bundle(db, focus_year, focus_month, include_excluded=show_excluded)
+            
             with ui.row().classes('w-full gap-6'):
                 
                 # Left: Budget Progress
@@ -178,7 +181,7 @@ def content():
                         ui.label(f'Budget Progress').classes('text-xl font-bold')
                         ui.label(focus_month_name).classes('text-sm px-2 py-1 bg-blue-100 text-blue-800 rounded')
                     
-                    budgets = get_budget_progress(db, focus_year, focus_month, include_excluded=show_excluded)
+                    budgets = bundle['budget_progress']
                     if not budgets:
                         ui.label('No budget data found.').classes('text-gray-400 italic')
                         ui.link('Create Budget?', '/settings').classes('text-blue-500 text-sm')
@@ -204,23 +207,21 @@ def content():
                          ui.label('Spending Breakdown').classes('text-xl font-bold')
                          ui.label(focus_month_name).classes('text-sm px-2 py-1 bg-yellow-100 text-yellow-800 rounded')
 
-                    cat_data = get_category_breakdown(db, focus_year, focus_month, include_excluded=show_excluded)
+                    cat_data = bundle['category_breakdown']
                     
-                    if not cat_data:
+                    if cat_data.empty:
                         ui.label('No transaction data for chart.').classes('text-gray-400 italic')
                     else:
-                        labels = [d['category'] for d in cat_data]
-                        parents = [d['section'] for d in cat_data]
-                        values = [d['amount'] for d in cat_data]
+                        labels = cat_data['category'].tolist()
+                        parents = cat_data['section'].tolist()
+                        values = cat_data['amount'].tolist()
                         
-                        # Add root nodes (Sections)
-                        unique_sections = list(set(parents))
-                        for s in unique_sections:
+                        # Add root nodes (Sections), valued at the sum of their categories
+                        section_totals = cat_data.groupby('section')['amount'].sum()
+                        for s, v in section_totals.items():
                             if s not in labels:
                                 labels.append(s)
                                 parents.append('') # Root
-                                # Sum values for section
-                                v = sum([d['amount'] for d in cat_data if d['section'] == s])
                                 values.append(v)
 
                         fig_sun = go.Figure(go.Sunburst(
@@ -1,6 +1,7 @@
 from nicegui import ui
 from database.connection import get_db
 from database.models import Transaction, ExclusionRule
+from services.importer import ExclusionMatcher
 from sqlalchemy import or_
 
 def content():
@@ -25,7 +26,7 @@ def content():
                     return
                 
                 try:
-                    exists = db.query(ExclusionRule).filter(ExclusionRule.value == val).first()
+                    exists = db.query(ExclusionRule.id).filter(ExclusionRule.value == val).first()
                     if exists:
                         ui.notify('Rule already exists', type='warning')
                         return
@@ -87,27 +88,14 @@ def content():
         # Apply Button
         async def reapply_rules():
             # Apply rules to EXISTING transactions
-            active_rules = db.query(ExclusionRule).filter(ExclusionRule.is_active == True).all()
+            # Rules compiled once, then matched against every transaction
+            matcher = ExclusionMatcher(db.query(ExclusionRule).filter(ExclusionRule.is_active == True).all())
             txs = db.query(Transaction).all()
             
-            import re
-            
             count = 0
             excluded_count = 0
             for tx in txs:
-                excluded = False
-                for r in active_rules:
-                    if r.rule_type == 'exact_match':
-                        if r.value.lower() == tx.description.lower():
-                            excluded = True; break
-                    elif r.rule_type == 'regex':
-                        try:
-                            if re.search(r.value, tx.description, re.IGNORECASE):
-                                excluded = True; break
-                        except: pass
-                    elif r.rule_type == 'contains':
-                        if r.value.lower() in tx.description.lower():
-                            excluded = True; break
+                excluded = matcher.matches(tx.description)
 
                 if tx.is_excluded != excluded:
                     tx.is_excluded = excluded
@@ -1,7 +1,7 @@
 from nicegui import ui
 from datetime import datetime
 from services.analytics import get_budget_comparison
-from database.connection import get_db, SessionLocal
+from database.connection import SessionLocal
 import pandas as pd
 
 def spending_report_page():